@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+import ipaddress
+from datetime import datetime
+from contextlib import redirect_stdout
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from colorama import Fore, Style, init
+
+import ip_alchemist
+
+# Initialize colorama
+init(autoreset=True)
+
+# ===== CONFIGURATION =====
+RESULTS_FILE = os.path.join("benchmarks", "results.jsonl")
+FARM_HOST = "127.0.0.1"
+EXIT_NETWORK = ipaddress.ip_address("127.1.0.1")  # Each fake proxy connects out from its own loopback address
+COUNTRIES = ["US", "DE", "NL", "FR", "GB", "SG", "JP", "BR"]
+REGRESSION_THRESHOLD = 0.10  # Flag p50 slowdowns above 10%
+
+# ===== FAKE PROXY FARM =====
+async def pipe(reader, writer, bandwidth=0):
+    """Copy one direction until EOF, optionally throttled to bandwidth bytes/s"""
+    try:
+        while True:
+            chunk = await reader.read(16384)
+            if not chunk:
+                break
+            writer.write(chunk)
+            await writer.drain()
+            if bandwidth:
+                await asyncio.sleep(len(chunk) / bandwidth)
+    except Exception:
+        pass
+    finally:
+        writer.close()
+
+class FakeProxy:
+    """HTTP or SOCKS5 proxy stand-in with injected latency, failures and bandwidth cap"""
+
+    def __init__(self, protocol, exit_ip, latency=50, jitter=0.2, failure_rate=0.0, bandwidth=0):
+        self.protocol = protocol
+        self.exit_ip = exit_ip
+        self.latency = latency          # ms added before answering
+        self.jitter = jitter            # +/- fraction applied to latency
+        self.failure_rate = failure_rate
+        self.bandwidth = bandwidth      # bytes/s towards the client, 0 = unlimited
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, FARM_HOST, 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def connect(self, host, port):
+        return await asyncio.open_connection(host, port, local_addr=(self.exit_ip, 0))
+
+    async def handle(self, reader, writer):
+        try:
+            delay = self.latency * (1 + random.uniform(-self.jitter, self.jitter)) / 1000
+            await asyncio.sleep(max(0, delay))
+            if random.random() < self.failure_rate:
+                writer.close()
+                return
+            if self.protocol == 'socks5':
+                upstream = await self.socks_handshake(reader, writer)
+            else:
+                upstream = await self.http_handshake(reader, writer)
+            if upstream is None:
+                writer.close()
+                return
+            up_reader, up_writer, pending = upstream
+            if pending:
+                up_writer.write(pending)
+            await asyncio.gather(pipe(reader, up_writer), pipe(up_reader, writer, self.bandwidth))
+        except Exception:
+            writer.close()
+
+    async def http_handshake(self, reader, writer):
+        head = await reader.readuntil(b'\r\n\r\n')
+        method, target, version = head.split(b'\r\n', 1)[0].decode('latin-1').split(' ', 2)
+        if method == 'CONNECT':
+            host, port = target.rsplit(':', 1)
+            up_reader, up_writer = await self.connect(host, int(port))
+            writer.write(b'HTTP/1.1 200 Connection Established\r\n\r\n')
+            await writer.drain()
+            return up_reader, up_writer, b''
+        url = urlparse(target)
+        up_reader, up_writer = await self.connect(url.hostname, url.port or 80)
+        path = url.path or '/'
+        if url.query:
+            path += '?' + url.query
+        rest = head.split(b'\r\n', 1)[1]
+        return up_reader, up_writer, f"{method} {path} {version}\r\n".encode() + rest
+
+    async def socks_handshake(self, reader, writer):
+        version, count = await reader.readexactly(2)
+        await reader.readexactly(count)
+        writer.write(b'\x05\x00')
+        _, cmd, _, atyp = await reader.readexactly(4)
+        if atyp == 1:
+            host = str(ipaddress.ip_address(await reader.readexactly(4)))
+        elif atyp == 4:
+            host = str(ipaddress.ip_address(await reader.readexactly(16)))
+        else:
+            host = (await reader.readexactly((await reader.readexactly(1))[0])).decode()
+        port = int.from_bytes(await reader.readexactly(2), 'big')
+        try:
+            up_reader, up_writer = await self.connect(host, port)
+        except OSError:
+            writer.write(b'\x05\x05\x00\x01\x00\x00\x00\x00\x00\x00')
+            await writer.drain()
+            return None
+        writer.write(b'\x05\x00\x00\x01\x00\x00\x00\x00\x00\x00')
+        await writer.drain()
+        return up_reader, up_writer, b''
+
+class ProxyFarm:
+    """Runs N fake proxies on one background event loop"""
+
+    def __init__(self, count, socks_share=0.2, **proxy_options):
+        self.count = count
+        self.socks_share = socks_share
+        self.proxy_options = proxy_options
+        self.proxies = []
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+
+    async def _start(self):
+        for i in range(self.count):
+            protocol = 'socks5' if random.random() < self.socks_share else 'http'
+            proxy = FakeProxy(protocol, str(EXIT_NETWORK + i), **self.proxy_options)
+            await proxy.start()
+            self.proxies.append(proxy)
+
+    def stop(self):
+        async def close():
+            for proxy in self.proxies:
+                proxy.server.close()
+        asyncio.run_coroutine_threadsafe(close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=2)
+
+# ===== LOCAL ENDPOINTS =====
+class LocalEndpoints:
+    """IP echo, download and synthetic proxy-list API on one local HTTP server"""
+
+    def __init__(self, farm, page_delay=0.0):
+        self.farm = farm
+        self.page_delay = page_delay
+        self.entries = [{
+            'ip': FARM_HOST,
+            'port': str(proxy.port),
+            'protocols': [proxy.protocol],
+            'country': random.choice(COUNTRIES),
+            'latency': proxy.latency,
+            'lastChecked': int(time.time())
+        } for proxy in farm.proxies]
+        self.server = None
+
+    @property
+    def base_url(self):
+        return f"http://{FARM_HOST}:{self.server.server_address[1]}"
+
+    def start(self):
+        endpoints = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def reply(self, body, content_type='text/plain'):
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == '/ip':
+                    self.reply(f"{self.client_address[0]}\n".encode())
+                elif url.path == '/download':
+                    self.reply(b'\0' * int(query.get('size', ['1048576'])[0]), 'application/octet-stream')
+                elif url.path == '/api/proxy-list':
+                    limit = int(query.get('limit', ['500'])[0])
+                    page = int(query.get('page', ['1'])[0])
+                    time.sleep(endpoints.page_delay)
+                    data = endpoints.entries[(page - 1) * limit:page * limit]
+                    self.reply(json.dumps({'data': data, 'total': len(endpoints.entries),
+                                           'page': page, 'limit': limit}).encode(), 'application/json')
+                else:
+                    self.send_error(404)
+
+        # The stock listen backlog of 5 would make the echo endpoint the bottleneck
+        server_class = type('EndpointServer', (ThreadingHTTPServer,), {'request_queue_size': 1024})
+        self.server = server_class((FARM_HOST, 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+# ===== BENCHMARKS =====
+def summarize(samples_ms, work=None):
+    """Return p50/p99/mean/min/max of samples, plus throughput when work units are given"""
+    if not samples_ms:
+        return {'runs': 0}
+    ordered = sorted(samples_ms)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+    stats = {
+        'runs': len(ordered),
+        'p50_ms': round(pick(0.50), 2),
+        'p99_ms': round(pick(0.99), 2),
+        'mean_ms': round(sum(ordered) / len(ordered), 2),
+        'min_ms': round(ordered[0], 2),
+        'max_ms': round(ordered[-1], 2)
+    }
+    if work is not None:
+        stats['throughput_per_s'] = round(work / (sum(ordered) / 1000), 1)
+    return stats
+
+def timed(func, *args, **kwargs):
+    """Run func quietly, returning (result, elapsed ms)"""
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        result = func(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+def reset_proxy_env():
+    # set_termux_proxy points HTTP_PROXY at the farm; API calls must stay direct
+    for name in ('HTTP_PROXY', 'HTTPS_PROXY'):
+        os.environ.pop(name, None)
+
+def bench_fetch(app, runs):
+    samples, fetched = [], 0
+    for _ in range(runs):
+        ok, elapsed = timed(app.fetch_live_proxies)
+        if ok:
+            samples.append(elapsed)
+            fetched += len(app.proxies)
+    return summarize(samples, fetched)
+
+def bench_validate(app, runs):
+    samples, probed, working = [], 0, 0
+    for _ in range(runs):
+        result, elapsed = timed(app.validate_all_proxies)
+        samples.append(elapsed)
+        probed += len(app.proxies)
+        working += len(result)
+    stats = summarize(samples, probed)
+    stats['working_ratio'] = round(working / probed, 3) if probed else 0
+    return stats
+
+def bench_find(app, runs):
+    samples, found = [], 0
+    for _ in range(runs):
+        app.current_proxy = None
+        proxy, elapsed = timed(app.find_working_proxy)
+        samples.append(elapsed)
+        found += bool(proxy)
+    stats = summarize(samples)
+    stats['success_ratio'] = round(found / runs, 3)
+    return stats
+
+def bench_first_working(app, runs):
+    """Time-to-first-working-proxy from an empty pool through the streaming pipeline"""
+    samples, found = [], 0
+    for _ in range(runs):
+        app.proxies = []
+        proxy, elapsed = timed(app.stream_fetch_proxies)
+        samples.append(elapsed)
+        found += bool(proxy)
+        # Let the pipeline drain before the next cold start
+        with redirect_stdout(io.StringIO()):
+            while app.active_pipeline:
+                time.sleep(0.01)
+    stats = summarize(samples)
+    stats['success_ratio'] = round(found / runs, 3)
+    return stats
+
+def bench_rotate(app, runs, standby):
+    samples, rotated = [], 0
+    for _ in range(runs):
+        if standby:
+            with redirect_stdout(io.StringIO()):
+                app.refill_standby()
+        else:
+            app.standby.entries.clear()
+        proxy, elapsed = timed(app.rotate_proxy)
+        reset_proxy_env()
+        samples.append(elapsed)
+        rotated += bool(proxy)
+    stats = summarize(samples)
+    stats['success_ratio'] = round(rotated / runs, 3)
+    return stats
+
+def bench_speed(app, runs, url, size):
+    working = [p for p in app.proxies if p.get('working')] or app.proxies
+    samples, speeds = [], []
+    for i in range(runs):
+        speed, elapsed = timed(app.speed_test, working[i % len(working)], test_url=url, timeout=30)
+        if speed:
+            samples.append(elapsed)
+            speeds.append(speed)
+    stats = summarize(samples, len(samples) * size / 1024)
+    if speeds:
+        stats['median_kb_s'] = round(sorted(speeds)[len(speeds) // 2], 1)
+    return stats
+
+# ===== RESULTS =====
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except Exception:
+        return None
+
+def load_previous(path, params):
+    """Return the latest stored run with the same parameters"""
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path) as f:
+        for line in f:
+            try:
+                run = json.loads(line)
+            except ValueError:
+                continue
+            if run.get('params') == params:
+                previous = run
+    return previous
+
+def save_results(path, run):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(run) + '\n')
+
+def report(results, previous):
+    print(f"\n{Fore.MAGENTA}{'='*86}{Style.RESET_ALL}")
+    print(f"{Fore.YELLOW}{'benchmark':<20}{'runs':>6}{'p50 ms':>11}{'p99 ms':>11}{'throughput/s':>14}{'ok':>8}  vs last{Style.RESET_ALL}")
+    print(f"{Fore.MAGENTA}{'='*86}{Style.RESET_ALL}")
+    for name, stats in results.items():
+        if not stats.get('runs'):
+            print(f"{name:<20}{'0':>6}   {Fore.RED}no successful runs{Style.RESET_ALL}")
+            continue
+        ratio = stats.get('success_ratio', stats.get('working_ratio', ''))
+        line = (f"{name:<20}{stats['runs']:>6}{stats['p50_ms']:>11.1f}{stats['p99_ms']:>11.1f}"
+                f"{stats.get('throughput_per_s', ''):>14}{ratio:>8}")
+        before = (previous or {}).get('results', {}).get(name, {})
+        if before.get('p50_ms'):
+            change = (stats['p50_ms'] - before['p50_ms']) / before['p50_ms']
+            color = Fore.RED if change > REGRESSION_THRESHOLD else Fore.GREEN if change < -REGRESSION_THRESHOLD else Fore.CYAN
+            line += f"  {color}{change:+.0%}{Style.RESET_ALL}"
+        print(line)
+    if previous:
+        print(f"\n{Fore.CYAN}Compared with {previous['timestamp']} ({previous.get('commit') or 'unknown commit'}){Style.RESET_ALL}")
+
+# ===== MAIN =====
+def main():
+    parser = argparse.ArgumentParser(description="Offline IP Alchemist benchmarks against a local fake proxy farm")
+    parser.add_argument('--proxies', type=int, default=50, help="fake proxies in the farm")
+    parser.add_argument('--latency', type=int, default=50, help="added proxy latency in ms")
+    parser.add_argument('--jitter', type=float, default=0.2, help="latency jitter as a fraction")
+    parser.add_argument('--failure-rate', type=float, default=0.2, help="share of connections a proxy drops")
+    parser.add_argument('--bandwidth', type=int, default=0, help="per-connection bytes/s, 0 for unlimited")
+    parser.add_argument('--socks-share', type=float, default=0.2, help="share of SOCKS5 proxies")
+    parser.add_argument('--page-size', type=int, default=500, help="proxies per synthetic API page")
+    parser.add_argument('--download-size', type=int, default=262144, help="speed test payload in bytes")
+    parser.add_argument('--runs', type=int, default=10, help="runs per benchmark")
+    parser.add_argument('--seed', type=int, default=1, help="random seed for the farm")
+    parser.add_argument('--only', help="comma separated subset: fetch,validate,find,first_working,rotate,speed")
+    parser.add_argument('--output', default=RESULTS_FILE, help="results file (JSON lines)")
+    parser.add_argument('--no-save', action='store_true', help="do not store this run")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    selected = set(args.only.split(',')) if args.only else None
+    wants = lambda name: selected is None or name in selected
+    output = os.path.abspath(args.output)
+    params = {key: getattr(args, key) for key in ('proxies', 'latency', 'jitter', 'failure_rate', 'bandwidth',
+                                                  'socks_share', 'page_size', 'download_size', 'runs', 'seed')}
+
+    print(f"{Fore.BLUE}🏭 Starting {args.proxies} fake proxies ({args.latency}ms, {args.failure_rate:.0%} failures)...{Style.RESET_ALL}")
+    farm = ProxyFarm(args.proxies, args.socks_share, latency=args.latency, jitter=args.jitter,
+                     failure_rate=args.failure_rate, bandwidth=args.bandwidth)
+    farm.start()
+    endpoints = LocalEndpoints(farm)
+    endpoints.start()
+
+    # The app writes config, databases and ~/.curlrc; keep all of it in a scratch directory
+    workdir = tempfile.mkdtemp(prefix="ip_alchemist_bench_")
+    home, cwd = os.environ.get('HOME'), os.getcwd()
+    os.environ['HOME'] = workdir
+    os.chdir(workdir)
+    reset_proxy_env()
+    ip_alchemist.IP_CHECK_URL = f"{endpoints.base_url}/ip"
+
+    with redirect_stdout(io.StringIO()):
+        app = ip_alchemist.IPAlchemist()
+    app.config.update({
+        'api_url': f"{endpoints.base_url}/api/proxy-list?limit={args.page_size}&page=1",
+        'api_pages': max(1, -(-args.proxies // args.page_size)),
+        'favorite_countries': [],
+        # System side effects are outside what we measure
+        'notifications': False,
+        'dns_protection': False,
+        'browser_spoofing': False,
+        'kill_switch': False,
+        'mac_randomization': False,
+        'tor_integration': False,
+        'single_host_mode': False,
+        'proxy_chain': []
+    })
+
+    results = {}
+    try:
+        if wants('fetch'):
+            print(f"{Fore.CYAN}⏱ fetch_live_proxies{Style.RESET_ALL}")
+            results['fetch'] = bench_fetch(app, args.runs)
+        else:
+            timed(app.fetch_live_proxies)
+        if wants('validate'):
+            print(f"{Fore.CYAN}⏱ validate_all_proxies{Style.RESET_ALL}")
+            results['validate'] = bench_validate(app, args.runs)
+        if wants('find'):
+            print(f"{Fore.CYAN}⏱ find_working_proxy{Style.RESET_ALL}")
+            results['find'] = bench_find(app, args.runs)
+        if wants('first_working'):
+            print(f"{Fore.CYAN}⏱ time to first working proxy (streaming){Style.RESET_ALL}")
+            results['first_working'] = bench_first_working(app, args.runs)
+        if wants('rotate'):
+            print(f"{Fore.CYAN}⏱ rotate_proxy (search and standby){Style.RESET_ALL}")
+            results['rotate_search'] = bench_rotate(app, args.runs, standby=False)
+            results['rotate_standby'] = bench_rotate(app, args.runs, standby=True)
+        if wants('speed'):
+            print(f"{Fore.CYAN}⏱ speed_test{Style.RESET_ALL}")
+            url = f"{endpoints.base_url}/download?size={args.download_size}"
+            results['speed'] = bench_speed(app, args.runs, url, args.download_size)
+    finally:
+        with redirect_stdout(io.StringIO()):
+            app.scheduler.stop()
+            app.sessions.close_all()
+            app.close_databases()
+            app.logger.close()
+        os.chdir(cwd)
+        if home is not None:
+            os.environ['HOME'] = home
+        shutil.rmtree(workdir, ignore_errors=True)
+        endpoints.stop()
+        farm.stop()
+
+    previous = load_previous(output, params)
+    report(results, previous)
+    if not args.no_save:
+        save_results(output, {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'version': ip_alchemist.VERSION,
+            'commit': git_commit(),
+            'python': sys.version.split()[0],
+            'params': params,
+            'results': results
+        })
+        print(f"{Fore.GREEN}💾 Results appended to {output}{Style.RESET_ALL}")
+
+if __name__ == "__main__":
+    main()
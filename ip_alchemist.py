@@ -3,31 +3,68 @@ import os
 import re
 import sys
 import time
+STARTUP_STARTED = time.perf_counter()  # Everything after this counts against the startup budget
 import json
 import random
+import heapq
+import bisect
 import signal
-import requests
+import argparse
+import importlib
+import importlib.util
 import threading
+import queue
 import subprocess
 from datetime import datetime, timedelta
-from urllib.parse import urlparse
+from array import array
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from urllib.parse import urlparse, urlencode, parse_qsl
 import platform
-import readline
 import fcntl
+import resource
 import socket
 import struct
 import uuid
 import sqlite3
+import socketserver
 import base64
-import geoip2.database
-import qrcode
-from PIL import Image
-from pyfiglet import Figlet
+import ipaddress
 from colorama import Fore, Style, init
 
 # Initialize colorama
 init(autoreset=True)
 
+# ===== LAZY IMPORTS =====
+IMPORT_TIMES = {}
+
+class LazyModule:
+    """Stand-in that imports the real module on first attribute access"""
+    
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+        
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(self._name)
+            IMPORT_TIMES[self._name] = (time.perf_counter() - start) * 1000
+            self.__dict__['_module'] = module
+        return getattr(module, attr)
+
+# Heavy or optional modules are paid for only when a feature first needs them
+requests = LazyModule("requests")
+asyncio = LazyModule("asyncio")
+qrcode = LazyModule("qrcode")
+geoip2_database = LazyModule("geoip2.database")
+http_server = LazyModule("http.server")
+numpy = LazyModule("numpy")  # Optional, vectorizes ProxyTable queries when installed
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
 # ===== CONFIGURATION =====
 PROXY_API_URL = "https://proxylist.geonode.com/api/proxy-list?limit=500&page=1&sort_by=lastChecked&sort_type=desc"
 TOR_BRIDGES_URL = "https://bridges.torproject.org/bridges?transport=obfs4"
@@ -40,45 +77,2267 @@ LOCAL_PROXY_PORT = 8080  # Fixed local proxy port
 VERSION = "PROFESSIONAL v8.0"
 DNSCRYPT_CONFIG = "/data/data/com.termux/files/usr/etc/dnscrypt-proxy/dnscrypt-proxy.toml"
 GEOIP_DB_PATH = "GeoLite2-City.mmdb"
+GEOIP_ASN_DB_PATH = "GeoLite2-ASN.mmdb"  # Optional, adds ASN and network owner
 MAC_PREFIXES = ["00:16:3e", "00:0c:29", "00:50:56", "00:1c:42", "00:1d:0f"]
 TRAFFIC_DB = "traffic.db"
 FINGERPRINT_DB = "fingerprints.db"
+STARTUP_BUDGET_MS = 300
+PROXY_CACHE_DB = "proxy_cache/proxies.db"
+CONTROL_SOCKET = "ip_alchemist.sock"
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+
+# ===== STUNNING CREATIVE BANNER =====
+def display_banner():
+    print(Fore.MAGENTA)
+    print("  ██╗██████╗      ██████╗  ██████╗ ████████╗ ██████╗ ██████╗ ███████╗")
+    print("  ██║██╔══██╗    ██╔════╝ ██╔═══██╗╚══██╔══╝██╔═══██╗██╔══██╗██╔════╝")
+    print("  ██║██████╔╝    ██║  ███╗██║   ██║   ██║   ██║   ██║██████╔╝█████╗  ")
+    print("  ██║██╔═══╝     ██║   ██║██║   ██║   ██║   ██║   ██║██╔═══╝ ██╔══╝  ")
+    print("  ██║██║         ╚██████╔╝╚██████╔╝   ██║   ╚██████╔╝██║     ███████╗")
+    print("  ╚═╝╚═╝          ╚═════╝  ╚═════╝    ╚═╝    ╚═════╝ ╚═╝     ╚══════╝")
+    print(Fore.CYAN)
+    print("██████╗ ██████╗  ██████╗ ██╗  ██╗   ██╗    ███████╗ ██████╗██████╗ ██╗██████╗ ████████╗")
+    print("██╔══██╗██╔══██╗██╔═══██╗╚██╗██╔╝   ██║    ██╔════╝██╔════╝██╔══██╗██║██╔══██╗╚══██╔══╝")
+    print("██████╔╝██████╔╝██║   ██║ ╚███╔╝    ██║    ███████╗██║     ██████╔╝██║██████╔╝   ██║   ")
+    print("██╔═══╝ ██╔══██╗██║   ██║ ██╔██╗    ██║    ╚════██║██║     ██╔══██╗██║██╔═══╝    ██║   ")
+    print("██║     ██║  ██║╚██████╔╝██╔╝ ██╗   ██║    ███████║╚██████╗██║  ██║██║██║        ██║   ")
+    print("╚═╝     ╚═╝  ╚═╝ ╚═════╝ ╚═╝  ╚═╝   ╚═╝    ╚══════╝ ╚═════╝╚═╝  ╚═╝╚═╝╚═╝        ╚═╝   ")
+    print(Fore.YELLOW)
+    print("="*80)
+    print(f"Version: {VERSION} | Author: {Fore.RED}Aryan{Fore.YELLOW}".center(80))
+    print("="*80)
+    print("Enterprise-Grade Proxy Management & Network Security Solution".center(80))
+    print("="*80)
+    print(Fore.RESET)
+
+# ===== ASYNC PROXY PROTOCOLS =====
+async def read_http_head(reader):
+    """Read an HTTP message head, returning start line, headers and raw bytes"""
+    raw = await reader.readuntil(b'\r\n\r\n')
+    lines = raw.decode('latin-1').split('\r\n')
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    return lines[0], headers, raw
+
+async def read_http_body(reader, headers):
+    """Read a complete HTTP body using Content-Length or chunked framing"""
+    if 'content-length' in headers:
+        return await reader.readexactly(int(headers['content-length']))
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        body = b''
+        while True:
+            size = int((await reader.readline()).split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                await reader.readline()
+                return body
+            body += await reader.readexactly(size)
+            await reader.readline()
+    return await reader.read()
+
+async def socks_handshake(reader, writer, protocol, host, port):
+    """Negotiate a SOCKS5 or SOCKS4a tunnel to host:port"""
+    name = host.encode()
+    if protocol == 'socks5':
+        writer.write(b'\x05\x01\x00')
+        await writer.drain()
+        if await reader.readexactly(2) != b'\x05\x00':
+            raise ConnectionError("SOCKS5 authentication rejected")
+        writer.write(b'\x05\x01\x00\x03' + bytes([len(name)]) + name + struct.pack('>H', port))
+        await writer.drain()
+        reply = await reader.readexactly(4)
+        if reply[1] != 0:
+            raise ConnectionError(f"SOCKS5 connect failed with code {reply[1]}")
+        # Skip the bound address the proxy reports back
+        if reply[3] == 1:
+            await reader.readexactly(6)
+        elif reply[3] == 3:
+            await reader.readexactly((await reader.readexactly(1))[0] + 2)
+        elif reply[3] == 4:
+            await reader.readexactly(18)
+    else:
+        # SOCKS4a lets the proxy resolve the hostname
+        writer.write(b'\x04\x01' + struct.pack('>H', port) + b'\x00\x00\x00\x01\x00' + name + b'\x00')
+        await writer.drain()
+        reply = await reader.readexactly(8)
+        if reply[1] != 0x5a:
+            raise ConnectionError(f"SOCKS4 connect rejected with code {reply[1]}")
+
+async def open_proxy_tunnel(proxy, host, port, timeout=10):
+    """Open a raw TCP tunnel to host:port through an upstream proxy"""
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(proxy['host'], int(proxy['port'])), timeout)
+    try:
+        if proxy['protocol'].startswith('socks'):
+            await asyncio.wait_for(socks_handshake(reader, writer, proxy['protocol'], host, port), timeout)
+        else:
+            writer.write(f"CONNECT {host}:{port} HTTP/1.1\r\nHost: {host}:{port}\r\n\r\n".encode())
+            await writer.drain()
+            status_line, _, _ = await asyncio.wait_for(read_http_head(reader), timeout)
+            if status_line.split()[1] != '200':
+                raise ConnectionError(f"CONNECT refused: {status_line}")
+    except BaseException:
+        writer.close()
+        raise
+    return reader, writer
+
+async def async_probe_proxy(proxy, timeout=5, user_agent="Mozilla/5.0"):
+    """Fetch IP_CHECK_URL through a proxy, reporting exit IP and latency"""
+    url = urlparse(IP_CHECK_URL)
+    writer = None
+    
+    async def fetch():
+        nonlocal writer
+        if proxy['protocol'].startswith('socks'):
+            reader, writer = await open_proxy_tunnel(proxy, url.hostname, url.port or 80, timeout)
+            target = url.path or '/'
+        else:
+            reader, writer = await asyncio.open_connection(proxy['host'], int(proxy['port']))
+            target = IP_CHECK_URL
+        writer.write((f"GET {target} HTTP/1.1\r\nHost: {url.netloc}\r\n"
+                      f"User-Agent: {user_agent}\r\nConnection: close\r\n\r\n").encode())
+        await writer.drain()
+        status_line, headers, _ = await read_http_head(reader)
+        return status_line.split()[1], await read_http_body(reader, headers)
+    
+    start = time.time()
+    try:
+        status, body = await asyncio.wait_for(fetch(), timeout)
+        latency = int((time.time() - start) * 1000)
+        ip = body.decode(errors='ignore').strip()
+        if status == '200':
+            # Free proxies love to answer with captive or error pages
+            ipaddress.ip_address(ip)
+            return {'working': True, 'ip': ip, 'latency': latency, 'received': len(body)}
+    except Exception:
+        pass
+    finally:
+        if writer:
+            writer.close()
+    return {'working': False}
+
+# ===== BATCHED LOGGER =====
+class BatchLogger:
+    """Queue-backed logger with one writer thread flushing batches to the main and daily logs"""
+    
+    def __init__(self, main_log=LOG_FILE, daily_dir="logs", batch_size=256, flush_interval=1.0, max_queue=10000):
+        self.main_log = main_log
+        self.daily_dir = daily_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.main_file = None
+        self.daily_file = None
+        self.daily_date = None
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        
+    def write(self, message):
+        """Queue a log entry without touching the disk"""
+        entry = f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}"
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            # Under backpressure entries are dropped and summarized later
+            self.dropped += 1
+            
+    def flush(self, timeout=2):
+        """Block until everything queued so far is written"""
+        if self.stopped:
+            return False
+        marker = threading.Event()
+        try:
+            self.queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.wait(timeout)
+        
+    def close(self, timeout=2):
+        """Flush pending entries and stop the writer thread"""
+        if self.stopped:
+            return
+        self.flush(timeout)
+        self.stopped = True
+        self.queue.put(None)
+        self.thread.join(timeout)
+        
+    def run(self):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+                    
+            entries = [item for item in batch if isinstance(item, str)]
+            if self.dropped:
+                dropped, self.dropped = self.dropped, 0
+                entries.append(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] "
+                               f"Logger dropped {dropped} entries under backpressure")
+            if entries:
+                self.write_batch(entries)
+                
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if None in batch:
+                break
+                
+        for f in (self.main_file, self.daily_file):
+            if f:
+                f.close()
+                
+    def write_batch(self, entries):
+        try:
+            today = datetime.now().strftime('%Y%m%d')
+            if self.daily_date != today:
+                # Daily rotation
+                if self.daily_file:
+                    self.daily_file.close()
+                self.daily_file = open(os.path.join(self.daily_dir, f"proxy_{today}.log"), 'a')
+                self.daily_date = today
+            if not self.main_file:
+                self.main_file = open(self.main_log, 'a')
+                
+            data = "\n".join(entries) + "\n"
+            for f in (self.main_file, self.daily_file):
+                f.write(data)
+                f.flush()
+        except OSError:
+            pass
+
+# ===== SQLITE PERSISTENCE =====
+class Database:
+    """Long-lived SQLite connection with tuned pragmas and a write-behind queue"""
+    
+    def __init__(self, path, mmap_size=64 * 1024 * 1024, cached_statements=256, batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        self.lock = threading.RLock()
+        # One connection per database, shared by all threads under a lock
+        self.conn = sqlite3.connect(path, check_same_thread=False, cached_statements=cached_statements)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        self.writes = queue.Queue()
+        self.writer = None
+        self.closed = False
+        
+    def execute(self, sql, params=()):
+        """Run a read query and return all rows"""
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+            
+    @contextmanager
+    def transaction(self):
+        """Yield the connection inside a single committed transaction"""
+        with self.lock, self.conn:
+            yield self.conn
+            
+    def submit(self, sql, params=()):
+        """Queue a write for the background writer; never blocks the caller"""
+        self.submit_many(sql, [params])
+        
+    def submit_many(self, sql, rows):
+        if self.writer is None:
+            self.writer = threading.Thread(target=self.run_writer, daemon=True)
+            self.writer.start()
+        self.writes.put((sql, rows))
+        
+    def run_writer(self):
+        while True:
+            batch = [self.writes.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.writes.get_nowait())
+                except queue.Empty:
+                    break
+            # Queued writes share one transaction
+            statements = [item for item in batch if isinstance(item, tuple)]
+            if statements:
+                try:
+                    with self.transaction() as conn:
+                        for sql, rows in statements:
+                            conn.executemany(sql, rows)
+                except sqlite3.Error:
+                    pass
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if None in batch:
+                return
+                
+    def flush(self, timeout=5):
+        """Block until queued writes are committed"""
+        if self.writer is None or not self.writer.is_alive():
+            return True
+        marker = threading.Event()
+        self.writes.put(marker)
+        return marker.wait(timeout)
+        
+    def close(self):
+        """Commit queued writes and close the connection"""
+        if self.closed:
+            return
+        self.closed = True
+        if self.writer and self.writer.is_alive():
+            self.flush()
+            self.writes.put(None)
+            self.writer.join(timeout=2)
+        with self.lock:
+            self.conn.close()
+
+# ===== TRAFFIC METER =====
+class TrafficMeter:
+    """Buffers per-proxy byte counts and flushes them into traffic.db with rollup tables"""
+    
+    ROLLUPS = (
+        ('traffic_minute', '%Y-%m-%d %H:%M'),
+        ('traffic_hour', '%Y-%m-%d %H:00'),
+        ('traffic_day', '%Y-%m-%d')
+    )
+    
+    def __init__(self, db, flush_interval=5):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.buffer = {}
+        self.buffer_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        with self.db.transaction() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS traffic
+                            (timestamp DATETIME, sent INTEGER, received INTEGER, proxy TEXT)''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_traffic_timestamp ON traffic(timestamp)")
+            for table, _ in self.ROLLUPS:
+                conn.execute(f'''CREATE TABLE IF NOT EXISTS {table}
+                                 (bucket TEXT, proxy TEXT, sent INTEGER, received INTEGER,
+                                 PRIMARY KEY (bucket, proxy))''')
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        
+    def record(self, proxy, sent=0, received=0):
+        """Add bytes for a proxy to the in-memory buffer"""
+        with self.buffer_lock:
+            counts = self.buffer.get(proxy)
+            if counts is None:
+                self.buffer[proxy] = [sent, received]
+            else:
+                counts[0] += sent
+                counts[1] += received
+                
+    def run(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self.flush()
+            
+    def flush(self):
+        """Write buffered counts as one batched transaction"""
+        with self.buffer_lock:
+            buffer, self.buffer = self.buffer, {}
+        if not buffer:
+            return 0
+        now = datetime.now()
+        rows = [(proxy, sent, received) for proxy, (sent, received) in buffer.items()]
+        try:
+            with self.db.transaction() as conn:
+                conn.executemany("INSERT INTO traffic (timestamp, sent, received, proxy) VALUES (?, ?, ?, ?)",
+                                 [(now.strftime('%Y-%m-%d %H:%M:%S'), sent, received, proxy)
+                                  for proxy, sent, received in rows])
+                for table, bucket_format in self.ROLLUPS:
+                    bucket = now.strftime(bucket_format)
+                    conn.executemany(f'''INSERT INTO {table} VALUES (?, ?, ?, ?)
+                                        ON CONFLICT(bucket, proxy) DO UPDATE SET
+                                        sent = sent + excluded.sent,
+                                        received = received + excluded.received''',
+                                     [(bucket, proxy, sent, received) for proxy, sent, received in rows])
+        except sqlite3.Error:
+            # Keep the counts for the next attempt
+            for proxy, sent, received in rows:
+                self.record(proxy, sent, received)
+            return 0
+        return len(rows)
+        
+    def totals(self):
+        """Return all-time (sent, received) from the daily rollup"""
+        return self.db.execute("SELECT SUM(sent), SUM(received) FROM traffic_day")[0]
+        
+    def daily(self, days=7):
+        """Return (day, sent, received) rows for the last N days"""
+        since = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        return self.db.execute('''SELECT bucket, SUM(sent), SUM(received) FROM traffic_day
+                                  WHERE bucket >= ? GROUP BY bucket ORDER BY bucket''', (since,))
+                                  
+    def close(self):
+        """Flush remaining counts and stop the flush thread"""
+        self.stop_event.set()
+        self.thread.join(timeout=2)
+        self.flush()
+
+# ===== PROXY CACHE STORE =====
+class ProxyCacheStore:
+    """SQLite proxy cache keyed by host:port with sighting, validation and TTL columns"""
+    
+    COLUMNS = ('endpoint', 'host', 'port', 'protocol', 'country', 'latency', 'measured_latency',
+               'exit_ip', 'first_seen', 'last_seen', 'last_validated', 'ttl')
+    
+    def __init__(self, db, ttl=21600):
+        self.db = db
+        self.ttl = ttl
+        with self.db.transaction() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS proxies
+                            (endpoint TEXT PRIMARY KEY, host TEXT, port INTEGER, protocol TEXT,
+                            country TEXT, latency INTEGER, measured_latency INTEGER, exit_ip TEXT,
+                            first_seen REAL, last_seen REAL, last_validated REAL, ttl INTEGER)''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_proxies_validated ON proxies(last_validated)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_proxies_seen ON proxies(last_seen)")
+            
+    def upsert_many(self, proxies):
+        """Merge a batch of sightings in one transaction"""
+        now = time.time()
+        rows = []
+        for proxy in proxies:
+            validated = None
+            if proxy.get('working') and proxy.get('validated'):
+                validated = datetime.fromisoformat(proxy['validated']).timestamp()
+            rows.append((f"{proxy['host']}:{proxy['port']}", proxy['host'], int(proxy['port']), proxy['protocol'],
+                         proxy.get('country', ''), proxy.get('latency'), proxy.get('measured_latency'),
+                         proxy.get('ip'), now, now, validated, self.ttl))
+        with self.db.transaction() as conn:
+            conn.executemany('''INSERT INTO proxies VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                     ON CONFLICT(endpoint) DO UPDATE SET
+                                     protocol = excluded.protocol,
+                                     country = excluded.country,
+                                     latency = excluded.latency,
+                                     last_seen = excluded.last_seen,
+                                     ttl = excluded.ttl,
+                                     measured_latency = COALESCE(excluded.measured_latency, measured_latency),
+                                     exit_ip = COALESCE(excluded.exit_ip, exit_ip),
+                                     last_validated = COALESCE(excluded.last_validated, last_validated)''', rows)
+        return len(rows)
+        
+    def recently_validated(self, minutes):
+        """Return proxies validated in the last N minutes, freshest first"""
+        now = time.time()
+        rows = self.db.execute('''SELECT * FROM proxies
+                                  WHERE last_validated >= ? AND last_seen + ttl >= ?
+                                  ORDER BY last_validated DESC''', (now - minutes * 60, now))
+        proxies = []
+        for row in rows:
+            entry = dict(zip(self.COLUMNS, row))
+            proxies.append({
+                'host': entry['host'],
+                'port': entry['port'],
+                'protocol': entry['protocol'],
+                'country': entry['country'],
+                'latency': entry['latency'],
+                'measured_latency': entry['measured_latency'],
+                'ip': entry['exit_ip'],
+                'working': True,
+                'validated': datetime.fromtimestamp(entry['last_validated']).isoformat()
+            })
+        return proxies
+        
+    def purge_expired(self):
+        """Delete entries not seen within their TTL"""
+        with self.db.transaction() as conn:
+            return conn.execute("DELETE FROM proxies WHERE last_seen + ttl < ?", (time.time(),)).rowcount
+            
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM proxies")[0][0]
+
+# ===== GEOIP ENRICHMENT =====
+class GeoIPEnricher:
+    """Memory-mapped GeoIP lookups behind an LRU cache keyed by IP"""
+    
+    def __init__(self, city_path, asn_path=None, cache_size=4096):
+        self.paths = {'city': city_path, 'asn': asn_path}
+        self.readers = {}
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        
+    def reader(self, kind):
+        """Open a database in MODE_MMAP on first use, or None if it is missing"""
+        if kind not in self.readers:
+            path = self.paths.get(kind)
+            reader = None
+            if path and os.path.exists(path):
+                try:
+                    reader = geoip2_database.Reader(path, mode=geoip2_database.MODE_MMAP)
+                except Exception:
+                    print(f"{Fore.YELLOW}⚠️ Error loading GeoIP database {path}{Style.RESET_ALL}")
+            self.readers[kind] = reader
+        return self.readers[kind]
+        
+    @property
+    def available(self):
+        """True when at least one GeoIP database can be read"""
+        return self.reader('city') is not None or self.reader('asn') is not None
+        
+    def lookup(self, ip):
+        """Return location and network fields for an IP (empty when unknown)"""
+        with self.lock:
+            info = self.cache.get(ip)
+            if info is not None:
+                self.cache.move_to_end(ip)
+                self.hits += 1
+                return info
+            self.misses += 1
+            
+        info = {}
+        city_reader = self.reader('city')
+        if city_reader:
+            try:
+                record = city_reader.city(ip)
+                info['country'] = record.country.iso_code
+                info['city'] = record.city.name
+                info['latitude'] = record.location.latitude
+                info['longitude'] = record.location.longitude
+            except Exception:
+                pass
+        asn_reader = self.reader('asn')
+        if asn_reader:
+            try:
+                record = asn_reader.asn(ip)
+                info['asn'] = record.autonomous_system_number
+                info['as_org'] = record.autonomous_system_organization
+            except Exception:
+                pass
+        info = {key: value for key, value in info.items() if value is not None}
+        
+        # Misses are cached too so unknown addresses are not looked up again
+        with self.lock:
+            self.cache[ip] = info
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return info
+        
+    def enrich(self, proxies):
+        """Annotate proxies in place with GeoIP data, keeping API values; return count annotated"""
+        if not self.available:
+            return 0
+        enriched = 0
+        for proxy in proxies:
+            info = self.lookup(proxy['host'])
+            if not info:
+                continue
+            for key, value in info.items():
+                if not proxy.get(key):
+                    proxy[key] = value
+            enriched += 1
+        return enriched
+        
+    def close(self):
+        for reader in self.readers.values():
+            if reader:
+                reader.close()
+        self.readers = {}
+
+# ===== PROXY TABLE =====
+class ProxyRecord(MutableMapping):
+    """Dict-like view of one ProxyTable row, so callers keep using proxy['host'] and friends"""
+    
+    __slots__ = ('table', 'row')
+    
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+        
+    def __getitem__(self, key):
+        return self.table.get_field(self.row, key)
+        
+    def __setitem__(self, key, value):
+        self.table.set_field(self.row, key, value)
+        
+    def __delitem__(self, key):
+        self.table.del_field(self.row, key)
+        
+    def __iter__(self):
+        return iter(self.table.fields(self.row))
+        
+    def __len__(self):
+        return len(self.table.fields(self.row))
+        
+    def __repr__(self):
+        return repr(dict(self))
+
+class ProxyTable:
+    """Columnar proxy pool: typed arrays, interned strings, packed IPv4 hosts"""
+    
+    COLUMNS = ('host', 'port', 'protocol', 'country', 'latency', 'last_checked',
+               'is_favorite', 'working', 'measured_latency')
+    
+    def __init__(self, protocols=None, countries=None):
+        self.hosts = array('I')             # packed IPv4, 0 when the host lives in extras
+        self.ports = array('H')
+        self.protocol_codes = array('B')
+        self.country_codes = array('H')
+        self.latencies = array('d')         # API latency, NaN when unknown
+        self.last_checked = array('d')      # NaN when unknown
+        self.favorite_flags = array('b')    # -1 unknown, 0, 1
+        self.working_flags = array('b')     # -1 untested, 0 failed, 1 working
+        self.measured = array('i')          # measured latency in ms, -1 when unknown
+        self.extras = {}                    # row -> rarely set fields (exit ip, city, asn, ...)
+        # Intern tables are append-only, so tables derived from this one share them
+        self.protocols, self.protocol_index = protocols or ([], {})
+        # Country code 0 is reserved for "no country"; an empty string is a country like any other
+        self.countries, self.country_index = countries or ([None], {None: 0})
+        
+    def derived(self):
+        return ProxyTable((self.protocols, self.protocol_index), (self.countries, self.country_index))
+        
+    # ----- interning and packing -----
+    def intern_protocol(self, protocol):
+        code = self.protocol_index.get(protocol)
+        if code is None:
+            code = self.protocol_index[protocol] = len(self.protocols)
+            self.protocols.append(protocol)
+        return code
+        
+    def intern_country(self, country):
+        code = self.country_index.get(country)
+        if code is None:
+            code = self.country_index[country] = len(self.countries)
+            self.countries.append(country)
+        return code
+        
+    @staticmethod
+    def pack_host(host):
+        try:
+            return struct.unpack('!I', socket.inet_aton(host))[0] if host.count('.') == 3 else 0
+        except (OSError, AttributeError):
+            return 0
+            
+    @classmethod
+    def pack_hosts(cls, hosts):
+        """Pack a batch of hosts in one pass, falling back to per-host packing on any non-IPv4 entry"""
+        try:
+            packed = b''.join(map(socket.inet_aton, hosts))
+        except (OSError, TypeError):
+            packed = None
+        # inet_aton also accepts short forms like "10.1", which would not round-trip
+        if packed is None or ''.join(hosts).count('.') != 3 * len(hosts):
+            return array('I', map(cls.pack_host, hosts))
+        packed = array('I', packed)
+        if sys.byteorder == 'little':
+            packed.byteswap()
+        return packed
+        
+    @staticmethod
+    def number(value):
+        if value is None or value == '':
+            return float('nan')
+        return float(value)
+        
+    # ----- list-like access -----
+    def __len__(self):
+        return len(self.ports)
+        
+    def __iter__(self):
+        return (ProxyRecord(self, row) for row in range(len(self.ports)))
+        
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [ProxyRecord(self, row) for row in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("proxy table index out of range")
+        return ProxyRecord(self, index)
+        
+    def records(self, rows):
+        return [ProxyRecord(self, row) for row in rows]
+        
+    def key(self, row):
+        return f"{self.get_field(row, 'host')}:{self.ports[row]}"
+        
+    def endpoint(self, row):
+        """Hashable host:port identity of a row without unpacking the address"""
+        return (self.hosts[row] or self.extras[row]['host'], self.ports[row])
+        
+    @classmethod
+    def endpoint_key(cls, host, port):
+        return (cls.pack_host(host) or host, int(port))
+        
+    # ----- fields -----
+    def get_field(self, row, key):
+        if key == 'host':
+            packed = self.hosts[row]
+            return socket.inet_ntoa(struct.pack('!I', packed)) if packed else self.extras[row]['host']
+        if key == 'port':
+            return self.ports[row]
+        if key == 'protocol':
+            return self.protocols[self.protocol_codes[row]]
+        if key == 'country':
+            code = self.country_codes[row]
+            if not code:
+                raise KeyError(key)
+            return self.countries[code]
+        if key in ('latency', 'last_checked'):
+            value = (self.latencies if key == 'latency' else self.last_checked)[row]
+            if value != value:
+                raise KeyError(key)
+            return int(value) if value.is_integer() else value
+        if key in ('is_favorite', 'working'):
+            flag = (self.favorite_flags if key == 'is_favorite' else self.working_flags)[row]
+            if flag < 0:
+                raise KeyError(key)
+            return bool(flag)
+        if key == 'measured_latency':
+            value = self.measured[row]
+            if value < 0:
+                raise KeyError(key)
+            return value
+        return self.extras[row][key]
+        
+    def set_field(self, row, key, value):
+        if key == 'host':
+            packed = self.pack_host(value)
+            self.hosts[row] = packed
+            if not packed:
+                self.extras.setdefault(row, {})['host'] = value
+        elif key == 'port':
+            self.ports[row] = int(value)
+        elif key == 'protocol':
+            self.protocol_codes[row] = self.intern_protocol(value)
+        elif key == 'country':
+            self.country_codes[row] = self.intern_country(value)
+        elif key == 'latency':
+            self.latencies[row] = self.number(value)
+        elif key == 'last_checked':
+            self.last_checked[row] = self.number(value)
+        elif key == 'is_favorite':
+            self.favorite_flags[row] = -1 if value is None else int(bool(value))
+        elif key == 'working':
+            self.working_flags[row] = -1 if value is None else int(bool(value))
+        elif key == 'measured_latency':
+            self.measured[row] = -1 if value is None else int(value)
+        else:
+            self.extras.setdefault(row, {})[key] = value
+            
+    def del_field(self, row, key):
+        if key in self.COLUMNS[:3]:
+            raise KeyError(f"{key} is required")
+        self.get_field(row, key)
+        if key in self.COLUMNS:
+            self.set_field(row, key, None)
+        else:
+            del self.extras[row][key]
+            
+    def fields(self, row):
+        keys = ['host', 'port', 'protocol']
+        if self.country_codes[row]:
+            keys.append('country')
+        if self.latencies[row] == self.latencies[row]:
+            keys.append('latency')
+        if self.last_checked[row] == self.last_checked[row]:
+            keys.append('last_checked')
+        if self.favorite_flags[row] >= 0:
+            keys.append('is_favorite')
+        if self.working_flags[row] >= 0:
+            keys.append('working')
+        if self.measured[row] >= 0:
+            keys.append('measured_latency')
+        keys.extend(key for key in self.extras.get(row, ()) if key != 'host')
+        return keys
+        
+    # ----- building -----
+    def append(self, proxy):
+        """Add one proxy mapping as a new row and return its index"""
+        row = len(self.ports)
+        host = proxy['host']
+        packed = self.pack_host(host)
+        self.hosts.append(packed)
+        self.ports.append(int(proxy['port']))
+        self.protocol_codes.append(self.intern_protocol(proxy['protocol']))
+        self.country_codes.append(self.intern_country(proxy.get('country')))
+        self.latencies.append(self.number(proxy.get('latency')))
+        self.last_checked.append(self.number(proxy.get('last_checked')))
+        favorite, working, measured = proxy.get('is_favorite'), proxy.get('working'), proxy.get('measured_latency')
+        self.favorite_flags.append(-1 if favorite is None else int(bool(favorite)))
+        self.working_flags.append(-1 if working is None else int(bool(working)))
+        self.measured.append(-1 if measured is None else int(measured))
+        extra = {key: value for key, value in proxy.items() if key not in self.COLUMNS}
+        if not packed:
+            extra['host'] = host
+        if extra:
+            self.extras[row] = extra
+        return row
+        
+    @classmethod
+    def from_records(cls, proxies):
+        """Build a table from dicts or records; rows of one table are copied column-wise"""
+        if isinstance(proxies, ProxyTable):
+            return proxies
+        proxies = list(proxies)
+        source = proxies[0].table if proxies and isinstance(proxies[0], ProxyRecord) else None
+        if source is not None and all(isinstance(p, ProxyRecord) and p.table is source for p in proxies):
+            return source.take([p.row for p in proxies])
+        table = cls()
+        for proxy in proxies:
+            table.append(proxy)
+        return table
+        
+    def ingest_api(self, entries, protocol_preference, favorite_hosts=(), max_latency=None, countries=None):
+        """Append raw API entries that pass the filters, resolving each to its first preferred protocol"""
+        # Only the filter columns are built for every entry; full rows are materialized for survivors
+        latencies = array('d', [entry['latency'] for entry in entries])
+        country_codes = None
+        if countries:
+            # With the allowed countries interned up front, any other country can map to "missing"
+            for country in countries:
+                self.intern_country(country)
+            index = self.country_index
+            country_codes = array('H', [index.get(entry.get('country'), 0) for entry in entries])
+        rows = self.filter_rows(latencies, country_codes, max_latency, countries)
+        
+        codes = [self.intern_protocol(protocol) for protocol in protocol_preference]
+        hosts, ports, protocols, countries, picked, checked, favorites, extras = [], [], [], [], [], [], [], {}
+        offset = len(self.ports)
+        intern_country = self.intern_country
+        for row in rows:
+            entry = entries[row]
+            offered = entry['protocols']
+            for protocol, code in zip(protocol_preference, codes):
+                if protocol in offered:
+                    break
+            else:
+                continue
+            host = entry['ip']
+            hosts.append(host)
+            ports.append(int(entry['port']))
+            protocols.append(code)
+            countries.append(intern_country(entry.get('country')))
+            picked.append(latencies[row])
+            checked.append(entry.get('lastChecked') or float('nan'))
+            favorites.append(host in favorite_hosts)
+            
+        count = len(hosts)
+        packed = self.pack_hosts(hosts)
+        for index in range(count) if 0 in packed else ():
+            if not packed[index]:
+                extras[offset + index] = {'host': hosts[index]}
+        self.hosts.extend(packed)
+        self.ports.extend(array('H', ports))
+        self.protocol_codes.extend(array('B', protocols))
+        self.country_codes.extend(array('H', countries))
+        self.latencies.extend(array('d', picked))
+        self.last_checked.extend(array('d', checked))
+        self.favorite_flags.extend(array('b', favorites))
+        self.working_flags.extend(array('b', [-1]) * count)
+        self.measured.extend(array('i', [-1]) * count)
+        self.extras.update(extras)
+        return self
+        
+    def take(self, rows, dedupe=False):
+        """Return a new table holding the given rows in order (optionally first occurrence per endpoint)"""
+        if dedupe:
+            seen, unique = set(), []
+            for row in rows:
+                key = self.endpoint(row)
+                if key not in seen:
+                    seen.add(key)
+                    unique.append(row)
+            rows = unique
+        table = self.derived()
+        for name in ('hosts', 'ports', 'protocol_codes', 'country_codes', 'latencies',
+                     'last_checked', 'favorite_flags', 'working_flags', 'measured'):
+            column = getattr(self, name)
+            setattr(table, name, array(column.typecode, [column[row] for row in rows]))
+        extras = self.extras
+        if extras:
+            table.extras = {new: dict(extras[old]) for new, old in enumerate(rows) if old in extras}
+        return table
+        
+    def extend(self, other):
+        """Append every row of another table sharing this table's intern tables"""
+        offset = len(self)
+        for name in ('hosts', 'ports', 'protocol_codes', 'country_codes', 'latencies',
+                     'last_checked', 'favorite_flags', 'working_flags', 'measured'):
+            getattr(self, name).extend(getattr(other, name))
+        for row, extra in other.extras.items():
+            self.extras[offset + row] = dict(extra)
+        return self
+        
+    def to_dicts(self):
+        return [dict(record) for record in self]
+        
+    # ----- vectorized queries -----
+    def _np(self, column, dtype):
+        return numpy.frombuffer(column, dtype=dtype) if len(column) else numpy.zeros(0, dtype=dtype)
+        
+    def filter_rows(self, latencies, country_codes, max_latency=None, countries=None):
+        """Return row indices whose latency is within max_latency and country is allowed"""
+        allowed = None
+        if countries:
+            allowed = {self.country_index[c] for c in countries if c in self.country_index}
+        if HAS_NUMPY:
+            mask = numpy.ones(len(latencies), dtype=bool)
+            if max_latency is not None:
+                mask &= ~(self._np(latencies, numpy.float64) > max_latency)  # NaN (unknown) passes
+            if allowed is not None:
+                mask &= numpy.isin(self._np(country_codes, numpy.uint16), list(allowed))
+            return numpy.flatnonzero(mask).tolist()
+        rows = range(len(latencies))
+        if max_latency is not None:
+            rows = [row for row, latency in enumerate(latencies) if not latency > max_latency]
+        if allowed is not None:
+            rows = [row for row in rows if country_codes[row] in allowed]
+        return rows
+        
+    def rank_keys(self):
+        """Candidate rank per row: validated by measured latency, then untested, then failed"""
+        tiers = {1: 0, -1: 1, 0: 2}
+        inf = float('inf')
+        return [(tiers[working], measured if working == 1 and measured >= 0 else
+                 latency if latency == latency else inf)
+                for working, measured, latency in zip(self.working_flags, self.measured, self.latencies)]
+                
+    def ranked_rows(self):
+        if HAS_NUMPY:
+            working = self._np(self.working_flags, numpy.int8)
+            measured = self._np(self.measured, numpy.int32)
+            latency = numpy.nan_to_num(self._np(self.latencies, numpy.float64), nan=numpy.inf)
+            tier = numpy.where(working == 1, 0, numpy.where(working == 0, 2, 1))
+            value = numpy.where((working == 1) & (measured >= 0), measured, latency)
+            return numpy.lexsort((value, tier)).tolist()
+        keys = self.rank_keys()
+        return sorted(range(len(keys)), key=keys.__getitem__)
+        
+    def ranked(self):
+        """Return a copy sorted by candidate rank"""
+        return self.take(self.ranked_rows())
+        
+    def top_k(self, count, exclude=()):
+        """Return the count lowest-latency records, skipping excluded endpoint keys"""
+        wanted = count + len(exclude)
+        if HAS_NUMPY:
+            latency = numpy.nan_to_num(self._np(self.latencies, numpy.float64), nan=numpy.inf)
+            if wanted < len(latency):
+                candidates = numpy.argpartition(latency, wanted)[:wanted]
+                rows = candidates[numpy.argsort(latency[candidates], kind='stable')].tolist()
+            else:
+                rows = numpy.argsort(latency, kind='stable').tolist()
+        else:
+            latencies = self.latencies
+            inf = float('inf')
+            rows = heapq.nsmallest(wanted, range(len(self)),
+                                   key=lambda row: latencies[row] if latencies[row] == latencies[row] else inf)
+        return [ProxyRecord(self, row) for row in rows if self.key(row) not in exclude][:count]
+        
+    def favorites(self):
+        return [ProxyRecord(self, row) for row, flag in enumerate(self.favorite_flags) if flag == 1]
+        
+    def memory_bytes(self):
+        columns = (self.hosts, self.ports, self.protocol_codes, self.country_codes, self.latencies,
+                   self.last_checked, self.favorite_flags, self.working_flags, self.measured)
+        return sum(column.itemsize * len(column) for column in columns)
+
+# ===== PROXY REGISTRY =====
+class ProxyRegistry:
+    """Owns the proxy pool, favorites and blacklist behind hash indexes"""
+    
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.favorite_index = {}   # host -> favorite entry, in the order they were added
+        self.blacklist_index = {}  # "host:port" -> None, an insertion-ordered set
+        self.replace(ProxyTable())
+        
+    # ----- proxy pool -----
+    @property
+    def proxies(self):
+        return self.table
+        
+    def replace(self, proxies):
+        """Swap in a new pool and rebuild its indexes in one pass over the columns"""
+        table = ProxyTable.from_records(proxies)
+        extras = table.extras
+        by_endpoint = {}
+        for row, endpoint in enumerate(zip(table.hosts, table.ports)):
+            if not endpoint[0]:
+                endpoint = (extras[row]['host'], endpoint[1])
+            if endpoint not in by_endpoint:
+                by_endpoint[endpoint] = row
+        by_country = self.group(table.country_codes, table.countries)
+        by_protocol = self.group(table.protocol_codes, table.protocols)
+        with self.lock:
+            self.table = table
+            self.by_endpoint, self.by_country, self.by_protocol = by_endpoint, by_country, by_protocol
+            
+    @staticmethod
+    def group(codes, names):
+        """Map each interned name to an insertion-ordered set of the rows carrying it"""
+        groups = {}
+        for row, code in enumerate(codes):
+            rows = groups.get(code)
+            if rows is None:
+                rows = groups[code] = {}
+            rows[row] = None
+        return {names[code]: rows for code, rows in groups.items()}
+        
+    def _index_row(self, row):
+        table = self.table
+        self.by_endpoint.setdefault(table.endpoint(row), row)
+        self.by_country.setdefault(table.countries[table.country_codes[row]], {})[row] = None
+        self.by_protocol.setdefault(table.protocols[table.protocol_codes[row]], {})[row] = None
+        
+    def add(self, proxy):
+        """Append a proxy unless its endpoint is already pooled; return its record"""
+        with self.lock:
+            row = self.by_endpoint.get(ProxyTable.endpoint_key(proxy['host'], proxy['port']))
+            if row is None:
+                row = self.table.append(proxy)
+                self._index_row(row)
+            return self.table[row]
+            
+    def remove(self, host, port):
+        """Drop a proxy from the pool; records handed out earlier keep pointing at the old table"""
+        with self.lock:
+            row = self.by_endpoint.get(ProxyTable.endpoint_key(host, port))
+            if row is None:
+                return False
+            # Rows shift on removal, so copy the survivors rather than invalidate live records
+            self.replace(self.table.take([r for r in range(len(self.table)) if r != row]))
+            return True
+            
+    def merge(self, updates):
+        """Fold field updates into the current pool by endpoint and re-rank it.
+        Proxies dropped from the pool since stay dropped, proxies added since are kept."""
+        updates = {ProxyTable.endpoint_key(u['host'], u['port']): u for u in updates}
+        with self.lock:
+            merged = []
+            for record in self.table:
+                update = updates.get(ProxyTable.endpoint_key(record['host'], record['port']))
+                merged.append({**dict(record), **update} if update else record)
+            self.replace(ProxyTable.from_records(merged).ranked())
+            return self.table
+            
+    def lookup(self, host, port):
+        """The pooled record for host:port, or None"""
+        with self.lock:  # by_endpoint and table are swapped together by replace()
+            row = self.by_endpoint.get(ProxyTable.endpoint_key(host, port))
+            return None if row is None else self.table[row]
+        
+    def select(self, country=None, protocol=None):
+        """Pooled records in a country and/or using a protocol, in pool order"""
+        with self.lock:
+            if country is None and protocol is None:
+                return list(self.table)
+            rows = None
+            if country is not None:
+                rows = self.by_country.get(country, {}).keys()
+            if protocol is not None:
+                matching = self.by_protocol.get(protocol, {}).keys()
+                rows = matching if rows is None else rows & matching
+            return self.table.records(sorted(rows))
+            
+    def counts(self):
+        """Pool size per (country, protocol) pair straight from the indexes"""
+        with self.lock:
+            return {(country, protocol): overlap
+                    for country, rows in self.by_country.items()
+                    for protocol, matching in self.by_protocol.items()
+                    if (overlap := len(rows.keys() & matching.keys()))}
+                    
+    # ----- favorites -----
+    @property
+    def favorites(self):
+        return list(self.favorite_index.values())
+        
+    def set_favorites(self, favorites):
+        with self.lock:
+            self.favorite_index = {fav['host']: fav for fav in favorites}
+            
+    def favorite_hosts(self):
+        return self.favorite_index.keys()
+        
+    def is_favorite(self, host):
+        return host in self.favorite_index
+        
+    def add_favorite(self, entry):
+        """Store a favorite entry keyed by host; False if the host is already a favorite"""
+        with self.lock:
+            if entry['host'] in self.favorite_index:
+                return False
+            self.favorite_index[entry['host']] = entry
+            record = self.lookup(entry['host'], entry['port'])
+            if record is not None:
+                record['is_favorite'] = True
+            return True
+            
+    def remove_favorite(self, host):
+        with self.lock:
+            entry = self.favorite_index.pop(host, None)
+            if entry is not None:
+                record = self.lookup(host, entry['port'])
+                if record is not None:
+                    record['is_favorite'] = False
+            return entry is not None
+            
+    # ----- blacklist -----
+    @property
+    def blacklist(self):
+        return list(self.blacklist_index)
+        
+    def set_blacklist(self, keys):
+        with self.lock:
+            self.blacklist_index = dict.fromkeys(keys)
+            
+    def is_blacklisted(self, proxy):
+        return f"{proxy['host']}:{proxy['port']}" in self.blacklist_index
+        
+    def ban(self, proxy):
+        """Blacklist a proxy and drop it from the pool"""
+        with self.lock:
+            self.blacklist_index[f"{proxy['host']}:{proxy['port']}"] = None
+            self.remove(proxy['host'], proxy['port'])
+
+# ===== PROXY SCORING ENGINE =====
+class ProxyScorer:
+    """Live proxy scores (EWMA latency, success ratio, recent failures) in a priority heap"""
+    
+    def __init__(self, alpha=0.3, failure_window=300, failure_penalty=4.0, sample_size=16, min_samples=3):
+        self.alpha = alpha                      # EWMA weight of the newest latency sample
+        self.failure_window = failure_window    # seconds until a failure stops hurting the score
+        self.failure_penalty = failure_penalty  # score multiplier right after a failure
+        self.sample_size = sample_size          # recent latencies kept per proxy for percentiles
+        self.min_samples = min_samples          # samples needed before percentiles are trusted
+        self.stats = {}
+        self.heap = []
+        self.seq = 0  # shared version counter, so a dropped and re-added key never reuses a version
+        self.lock = threading.Lock()
+        
+    @staticmethod
+    def key(proxy):
+        return f"{proxy['host']}:{proxy['port']}"
+        
+    @staticmethod
+    def base_score(entry):
+        """Expected latency inflated by unreliability; a lower bound of score() that never decays"""
+        success_ratio = (entry['successes'] + 1) / (entry['successes'] + entry['failures'] + 2)
+        return entry['ewma'] / success_ratio
+        
+    def score(self, entry, now=None):
+        """Lower is better: expected latency inflated by unreliability and recent failures"""
+        score = self.base_score(entry)
+        if entry['last_failure']:
+            since = (now or time.time()) - entry['last_failure']
+            score *= 1 + self.failure_penalty * max(0.0, 1 - since / self.failure_window)
+        return score
+        
+    def _entry(self, proxy):
+        key = self.key(proxy)
+        entry = self.stats.get(key)
+        if entry is None:
+            # Unprobed proxies start from the API's own latency figure
+            entry = {'proxy': proxy, 'ewma': float(proxy.get('latency') or 1000), 'successes': 0,
+                     'failures': 0, 'last_failure': None, 'version': 0}
+            self.stats[key] = entry
+        return key, entry
+        
+    def _push(self, key, entry):
+        # Older heap items for this key become stale and are skipped when popped. The heap
+        # holds the time-independent base score; best() applies the decaying failure penalty.
+        self.seq += 1
+        entry['version'] = self.seq
+        heapq.heappush(self.heap, (self.base_score(entry), entry['version'], key))
+        if len(self.heap) > 4 * len(self.stats) + 64:
+            self.heap = [(self.base_score(e), e['version'], k) for k, e in self.stats.items()]
+            heapq.heapify(self.heap)
+            
+    def sync(self, proxies):
+        """Track exactly the given proxy pool, keeping history of proxies still in it"""
+        with self.lock:
+            keys = set()
+            for proxy in proxies:
+                key, entry = self._entry(proxy)
+                entry['proxy'] = proxy
+                keys.add(key)
+                if entry['version'] == 0:
+                    self._push(key, entry)
+            for key in set(self.stats) - keys:
+                del self.stats[key]
+                
+    def record(self, proxy, working, latency=None):
+        """Fold one probe result into the proxy's score"""
+        with self.lock:
+            key, entry = self._entry(proxy)
+            if working:
+                entry['successes'] += 1
+                if latency is not None:
+                    entry['ewma'] = self.alpha * latency + (1 - self.alpha) * entry['ewma']
+                    # Only proxies that ever answered pay for a sample ring
+                    if 'samples' not in entry:
+                        entry['samples'] = deque(maxlen=self.sample_size)
+                    entry['samples'].append(latency)
+            else:
+                entry['failures'] += 1
+                entry['last_failure'] = time.time()
+            self._push(key, entry)
+            
+    def discard(self, proxy):
+        """Forget a proxy's stats; its heap entries go stale and are skipped by best()"""
+        with self.lock:
+            self.stats.pop(self.key(proxy), None)
+            
+    def percentile(self, proxy, q):
+        """q-th percentile (nearest rank) of the proxy's recent latencies in ms, or None"""
+        with self.lock:
+            entry = self.stats.get(self.key(proxy))
+            samples = sorted(entry.get('samples', ())) if entry else []
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q / 100 * len(samples)))]
+        
+    def expected_latency(self, proxy):
+        """Typical latency in ms: the recent median, else the EWMA seeded from the API figure"""
+        median = self.percentile(proxy, 50)
+        if median is not None:
+            return median
+        entry = self.stats.get(self.key(proxy))
+        return entry['ewma'] if entry else float(proxy.get('latency') or 1000)
+        
+    def timeout(self, proxy, default, floor=1.0, ceiling=8.0, margin=1.5):
+        """Probe timeout in seconds: p95 latency plus a margin, clamped; default until enough samples"""
+        p95 = self.percentile(proxy, 95)
+        if p95 is None:
+            return default
+        return max(floor, min(ceiling, p95 / 1000 * margin))
+        
+    def best(self, count=1, exclude=()):
+        """Return the best scored proxies in O(count log n) without re-sorting the pool"""
+        now = time.time()
+        with self.lock:
+            picked, popped = [], []
+            penalized = []  # (current score, key) of popped proxies whose failure penalty still applies
+            while (self.heap or penalized) and len(picked) < count:
+                # Base scores never exceed current ones, so a penalized proxy is only due once
+                # no base score in the heap undercuts its current score
+                if self.heap and (not penalized or self.heap[0][0] < penalized[0][0]):
+                    item = heapq.heappop(self.heap)
+                    entry = self.stats.get(item[2])
+                    if not entry or entry['version'] != item[1]:
+                        continue
+                    popped.append(item)
+                    score = self.score(entry, now)
+                    if score > item[0]:
+                        heapq.heappush(penalized, (score, item[2]))
+                        continue
+                    key = item[2]
+                else:
+                    key = heapq.heappop(penalized)[1]
+                if key not in exclude:
+                    picked.append(self.stats[key]['proxy'])
+            for item in popped:
+                heapq.heappush(self.heap, item)
+            return picked
+
+# ===== FAILURE QUARANTINE =====
+class Quarantine:
+    """Proxies benched after failed probes, for a backoff that doubles per consecutive failure"""
+    
+    def __init__(self, base=60, factor=2.0, max_backoff=3600, clock=time.time):
+        self.base = base                # seconds benched after the first failure
+        self.factor = factor            # backoff growth per further consecutive failure
+        self.max_backoff = max_backoff  # cap on a single bench period
+        self.clock = clock              # wall clock so release times survive restarts
+        self.entries = {}               # key -> [strikes, released_at]
+        self.lock = threading.Lock()
+        
+    def __len__(self):
+        return len(self.active())
+        
+    def __contains__(self, key):
+        entry = self.entries.get(key)
+        return entry is not None and entry[1] > self.clock()
+        
+    def fail(self, proxy):
+        """Bench a proxy that failed a probe; return the backoff in seconds"""
+        key = ProxyScorer.key(proxy)
+        with self.lock:
+            entry = self.entries.setdefault(key, [0, 0])
+            entry[0] += 1
+            backoff = min(self.max_backoff, self.base * self.factor ** (entry[0] - 1))
+            entry[1] = self.clock() + backoff
+            return backoff
+            
+    def succeed(self, proxy):
+        """Release a proxy that answered and halve its strikes so old failures fade"""
+        key = ProxyScorer.key(proxy)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return
+            entry[0] //= 2
+            entry[1] = self.clock()
+            if not entry[0]:
+                del self.entries[key]
+                
+    def active(self):
+        """Keys benched right now, as a set for constant-time exclusion"""
+        now = self.clock()
+        with self.lock:
+            return {key for key, (_, released_at) in self.entries.items() if released_at > now}
+            
+    def prune(self):
+        """Forget proxies that have been released for longer than the longest backoff"""
+        horizon = self.clock() - self.max_backoff
+        with self.lock:
+            for key in [key for key, (_, released_at) in self.entries.items() if released_at < horizon]:
+                del self.entries[key]
+                
+    def to_dict(self):
+        self.prune()
+        with self.lock:
+            return {key: {"strikes": strikes, "until": released_at}
+                    for key, (strikes, released_at) in self.entries.items()}
+                    
+    def load(self, data):
+        with self.lock:
+            self.entries = {key: [int(entry["strikes"]), float(entry["until"])] for key, entry in data.items()}
+        self.prune()
+
+# ===== HOT STANDBY POOL =====
+class StandbyPool:
+    """Recently validated proxies kept ready for an instant switch"""
+    
+    def __init__(self, size=5, max_age=120, clock=time.monotonic):
+        self.size = size        # proxies to keep ready
+        self.max_age = max_age  # seconds a validation stays trustworthy
+        self.clock = clock
+        self.entries = OrderedDict()  # key -> (proxy, validated_at), freshest last
+        self.lock = threading.Lock()
+        
+    def __len__(self):
+        return len(self.entries)
+        
+    def add(self, proxy):
+        """Store a proxy that just passed validation"""
+        key = ProxyScorer.key(proxy)
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (proxy, self.clock())
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+                
+    def discard(self, proxy):
+        with self.lock:
+            self.entries.pop(ProxyScorer.key(proxy), None)
+            
+    def keys(self):
+        with self.lock:
+            return set(self.entries)
+            
+    def pop(self, exclude=()):
+        """Take the most recently validated proxy, dropping expired ones on the way"""
+        now = self.clock()
+        with self.lock:
+            skipped = []
+            proxy = None
+            while self.entries:
+                key, (candidate, validated_at) = self.entries.popitem()
+                if now - validated_at > self.max_age:
+                    continue
+                if key in exclude:
+                    skipped.append((key, (candidate, validated_at)))
+                    continue
+                proxy = candidate
+                break
+            for key, entry in reversed(skipped):
+                self.entries[key] = entry
+            return proxy
+            
+    def aging(self):
+        """Return proxies past half their lifetime, due for revalidation"""
+        now = self.clock()
+        with self.lock:
+            return [proxy for proxy, validated_at in self.entries.values()
+                    if now - validated_at > self.max_age / 2]
+
+# ===== HTTP SESSION MANAGER =====
+class SessionManager:
+    """LRU of pooled requests sessions, one per upstream proxy"""
+    
+    def __init__(self, max_sessions=32, pool_size=4):
+        self.max_sessions = max_sessions
+        self.pool_size = pool_size
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+        
+    @staticmethod
+    def key(proxy):
+        if not proxy:
+            return "direct"
+        return f"{proxy['protocol']}://{proxy['host']}:{proxy['port']}"
+        
+    def get(self, proxy=None):
+        """Return the session for an upstream proxy (None for direct requests)"""
+        key = self.key(proxy)
+        with self.lock:
+            session = self.sessions.get(key)
+            if session:
+                self.sessions.move_to_end(key)
+                return session
+                
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            if proxy:
+                session.proxies = {'http': key, 'https': key}
+                # HTTP_PROXY from set_termux_proxy would otherwise override the session proxy
+                session.trust_env = False
+            self.sessions[key] = session
+            
+            # Evict least recently used sessions
+            while len(self.sessions) > self.max_sessions:
+                _, evicted = self.sessions.popitem(last=False)
+                evicted.close()
+            return session
+            
+    def close_all(self):
+        """Close every session and its connection pool"""
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
+
+# ===== UPSTREAM CONNECTION POOL =====
+class UpstreamPool:
+    """Keep-alive pool of idle connections to upstream proxies"""
+    
+    def __init__(self, max_per_upstream=8, idle_timeout=30):
+        self.max_per_upstream = max_per_upstream
+        self.idle_timeout = idle_timeout
+        self.idle = {}
+        self.hits = 0
+        self.misses = 0
+        
+    @staticmethod
+    def key(proxy):
+        return f"{proxy['protocol']}://{proxy['host']}:{proxy['port']}"
+        
+    @staticmethod
+    def is_alive(reader, writer):
+        # The event loop reads eagerly, so a closed or chatty peer shows up here
+        return not writer.is_closing() and not reader.at_eof() and reader.exception() is None
+        
+    def acquire(self, proxy):
+        """Return an idle live connection to the upstream, or None"""
+        conns = self.idle.get(self.key(proxy), [])
+        now = time.monotonic()
+        while conns:
+            reader, writer, idle_since = conns.pop()
+            if now - idle_since < self.idle_timeout and self.is_alive(reader, writer):
+                self.hits += 1
+                return reader, writer
+            writer.close()
+        self.misses += 1
+        return None
+        
+    def release(self, proxy, reader, writer):
+        """Park a connection for reuse, closing it if the pool is full"""
+        conns = self.idle.setdefault(self.key(proxy), [])
+        if len(conns) >= self.max_per_upstream or not self.is_alive(reader, writer):
+            writer.close()
+            return
+        conns.append((reader, writer, time.monotonic()))
+        
+    def expire(self):
+        """Close connections that have been idle longer than the timeout"""
+        now = time.monotonic()
+        for key, conns in list(self.idle.items()):
+            fresh = []
+            for reader, writer, idle_since in conns:
+                if now - idle_since < self.idle_timeout and self.is_alive(reader, writer):
+                    fresh.append((reader, writer, idle_since))
+                else:
+                    writer.close()
+            if fresh:
+                self.idle[key] = fresh
+            else:
+                del self.idle[key]
+                
+    def flush(self):
+        """Close every idle connection"""
+        for conns in self.idle.values():
+            for _, writer, _ in conns:
+                writer.close()
+        self.idle.clear()
+
+# ===== LOCAL FORWARDING PROXY =====
+class LocalProxyServer:
+    """Event-loop HTTP/CONNECT forwarder that relays clients to the current upstream proxy"""
+    
+    HOP_BY_HOP = ('connection', 'proxy-connection', 'keep-alive', 'proxy-authorization')
+    
+    def __init__(self, host=LOCAL_PROXY_HOST, port=LOCAL_PROXY_PORT, connect_timeout=10, idle_timeout=300,
+                 pool_max_per_upstream=8, pool_idle_timeout=30, continue_timeout=1):
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout
+        self.continue_timeout = continue_timeout  # wait for 100 Continue before sending the body anyway
+        self.upstream = None
+        self.pool = UpstreamPool(pool_max_per_upstream, pool_idle_timeout)
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.active_connections = 0
+        self.clients = set()    # open client writers, closed first on shutdown
+        self.on_traffic = None  # callback(proxy, sent, received)
+        
+    def account(self, upstream, sent=0, received=0):
+        if self.on_traffic:
+            self.on_traffic(upstream, sent, received)
+        
+    def set_upstream(self, proxy):
+        """Swap the upstream proxy in place; new requests use it immediately"""
+        changed = (proxy is None or self.upstream is None or
+                   UpstreamPool.key(proxy) != UpstreamPool.key(self.upstream))
+        self.upstream = proxy
+        # Connections to the previous upstream must not be reused after a rotation
+        if changed and self.loop and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.pool.flush)
+        
+    def start(self):
+        """Start the event loop thread and bind the listening socket"""
+        self.raise_fd_limit()
+        started = threading.Event()
+        errors = []
+        
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            try:
+                self.server = self.loop.run_until_complete(asyncio.start_server(
+                    self.handle_client, self.host, self.port, backlog=4096, reuse_address=True))
+            except Exception as e:
+                errors.append(e)
+                started.set()
+                self.loop.close()
+                return
+            started.set()
+            self.loop.create_task(self.reap_idle_connections())
+            self.loop.run_forever()
+            
+            # Close the listener and drop every open client connection
+            self.server.close()
+            self.pool.flush()
+            for writer in list(self.clients):
+                writer.close()
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+            
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait()
+        if errors:
+            raise errors[0]
+            
+    def stop(self):
+        """Stop the event loop and close all client connections"""
+        if self.loop and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread:
+            self.thread.join(timeout=5)
+            
+    async def reap_idle_connections(self):
+        while True:
+            await asyncio.sleep(max(1, self.pool.idle_timeout / 2))
+            self.pool.expire()
+            
+    @staticmethod
+    def raise_fd_limit():
+        # Every relayed client needs two sockets, the default soft limit is often 1024
+        try:
+            soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+            if hard == resource.RLIM_INFINITY or hard > soft:
+                resource.setrlimit(resource.RLIMIT_NOFILE, (hard if hard != resource.RLIM_INFINITY else 65536, hard))
+        except (ValueError, OSError):
+            pass
+            
+    def rewrite_head(self, raw, connection, start_line=None):
+        """Rebuild an HTTP message head without hop-by-hop headers"""
+        lines = raw.decode('latin-1').split('\r\n')
+        headers = [line for line in lines[1:] if line and line.split(':', 1)[0].strip().lower() not in self.HOP_BY_HOP]
+        headers.append(f"Connection: {connection}")
+        return '\r\n'.join([start_line or lines[0]] + headers + ['', '']).encode('latin-1')
+        
+    async def copy_body(self, reader, writer, headers, count=None, chunk_size=65536):
+        """Stream one message body; returns False if it was delimited by connection close"""
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            while True:
+                size_line = await reader.readline()
+                if not size_line:
+                    raise asyncio.IncompleteReadError(b'', None)
+                writer.write(size_line)
+                size = int(size_line.split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    # Trailers end with an empty line
+                    while True:
+                        line = await reader.readline()
+                        writer.write(line)
+                        if line in (b'\r\n', b'\n', b''):
+                            break
+                    break
+                await self.copy_exactly(reader, writer, size + 2, count, chunk_size)
+        elif 'content-length' in headers:
+            await self.copy_exactly(reader, writer, int(headers['content-length']), count, chunk_size)
+        else:
+            return False
+        await writer.drain()
+        return True
+        
+    async def copy_exactly(self, reader, writer, size, count=None, chunk_size=65536):
+        while size > 0:
+            data = await reader.read(min(size, chunk_size))
+            if not data:
+                raise asyncio.IncompleteReadError(b'', size)
+            writer.write(data)
+            await writer.drain()
+            size -= len(data)
+            if count:
+                count(len(data))
+                
+    async def copy_body_on_continue(self, reader, writer, upstream_reader, upstream_writer, headers, sent, received):
+        """Send an Expect: 100-continue body once the upstream asks for it.
+        Returns the next upstream response head and whether the body was sent."""
+        response = asyncio.ensure_future(read_http_head(upstream_reader))
+        try:
+            # Upstreams that ignore Expect wait for the body, so only hold it back briefly
+            await asyncio.wait({response}, timeout=self.continue_timeout)
+            if response.done():
+                status_line, _, raw = response.result()
+                if status_line.split(' ', 2)[1:2] != ['100']:
+                    return response.result(), False  # Rejected, the client must not send the body
+                writer.write(raw)
+                received(len(raw))
+                await writer.drain()
+                response = None
+            await self.copy_body(reader, upstream_writer, headers, sent)
+            return await asyncio.wait_for(response or read_http_head(upstream_reader), self.idle_timeout), True
+        finally:
+            if response and not response.done():
+                response.cancel()
+            
+    async def handle_client(self, reader, writer):
+        self.active_connections += 1
+        self.clients.add(writer)
+        try:
+            # Serve requests on this client connection until either side closes
+            while await self.handle_request(reader, writer):
+                pass
+        except (ConnectionError, OSError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            pass  # Shutdown; finishing quietly keeps asyncio from logging the cancelled callback
+        finally:
+            writer.close()
+            self.clients.discard(writer)
+            self.active_connections -= 1
+            
+    async def handle_request(self, reader, writer):
+        """Forward one client request; returns True if the client connection stays open"""
+        try:
+            request_line, headers, raw = await asyncio.wait_for(read_http_head(reader), self.idle_timeout)
+            method, target, version = request_line.split(' ', 2)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+            return False
+            
+        upstream = self.upstream
+        if not upstream:
+            writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+            return False
+            
+        if method == 'CONNECT' or upstream['protocol'].startswith('socks'):
+            await self.handle_tunnel(reader, writer, upstream, method, target, raw)
+            return False
+            
+        connection_header = (headers.get('connection', '') + headers.get('proxy-connection', '')).lower()
+        client_keep_alive = version == 'HTTP/1.1' and 'close' not in connection_header
+        expect_continue = '100-continue' in headers.get('expect', '').lower()
+        # Upgrade only survives the hop if Connection names it
+        head = self.rewrite_head(raw, 'Upgrade' if 'upgrade' in headers else 'keep-alive')
+        sent = lambda n: self.account(upstream, sent=n)
+        received = lambda n: self.account(upstream, received=n)
+        
+        # A pooled connection may have been closed by the upstream while idle; retry once on a fresh one
+        for attempt in range(2):
+            conn = self.pool.acquire(upstream) if attempt == 0 else None
+            reused = conn is not None
+            try:
+                if not conn:
+                    conn = await asyncio.wait_for(
+                        asyncio.open_connection(upstream['host'], int(upstream['port'])), self.connect_timeout)
+                upstream_reader, upstream_writer = conn
+                upstream_writer.write(head)
+                sent(len(head))
+                if expect_continue:
+                    (status_line, response_headers, response_raw), body_sent = await self.copy_body_on_continue(
+                        reader, writer, upstream_reader, upstream_writer, headers, sent, received)
+                else:
+                    await self.copy_body(reader, upstream_writer, headers, sent)
+                    body_sent = True
+                    status_line, response_headers, response_raw = await asyncio.wait_for(
+                        read_http_head(upstream_reader), self.idle_timeout)
+                break
+            except (ConnectionError, OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                if conn:
+                    conn[1].close()
+                if reused and method in ('GET', 'HEAD', 'OPTIONS'):
+                    continue
+                writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                await writer.drain()
+                return False
+                
+        try:
+            status = status_line.split(' ', 2)[1]
+            # Relay interim responses such as 100 Continue
+            while status.startswith('1') and status != '101':
+                writer.write(response_raw)
+                received(len(response_raw))
+                status_line, response_headers, response_raw = await read_http_head(upstream_reader)
+                status = status_line.split(' ', 2)[1]
+                
+            if status == '101':
+                # Protocol upgrade (e.g. WebSocket): the connection becomes a raw tunnel
+                writer.write(response_raw)
+                received(len(response_raw))
+                await writer.drain()
+                await asyncio.gather(self.pipe(reader, upstream_writer, sent),
+                                     self.pipe(upstream_reader, writer, received))
+                upstream_writer.close()
+                return False
+                
+            response_connection = (response_headers.get('connection', '') +
+                                   response_headers.get('proxy-connection', '')).lower()
+            no_body = method == 'HEAD' or status in ('204', '304')
+            framed = no_body or 'content-length' in response_headers or \
+                'chunked' in response_headers.get('transfer-encoding', '').lower()
+            # An unsent body may still arrive from the client, and the upstream may be waiting for it
+            keep_alive = client_keep_alive and framed and body_sent
+            writer.write(self.rewrite_head(response_raw, 'keep-alive' if keep_alive else 'close'))
+            received(len(response_raw))
+            
+            if no_body:
+                await writer.drain()
+            elif not await self.copy_body(upstream_reader, writer, response_headers, received):
+                # Body ends when the upstream closes the connection
+                await self.pipe(upstream_reader, writer, received)
+                upstream_writer.close()
+                return False
+                
+            if body_sent and status_line.startswith('HTTP/1.1') and 'close' not in response_connection:
+                self.pool.release(upstream, upstream_reader, upstream_writer)
+            else:
+                upstream_writer.close()
+            return keep_alive
+        except (ConnectionError, OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+            upstream_writer.close()
+            return False
+            
+    async def handle_tunnel(self, reader, writer, upstream, method, target, raw):
+        """Relay a CONNECT tunnel, or a plain request through a SOCKS upstream"""
+        upstream_writer = None
+        try:
+            try:
+                if method == 'CONNECT':
+                    host, port = target.rsplit(':', 1)
+                    upstream_reader, upstream_writer = await open_proxy_tunnel(
+                        upstream, host.strip('[]'), int(port), self.connect_timeout)
+                    writer.write(b"HTTP/1.1 200 Connection Established\r\n\r\n")
+                    await writer.drain()
+                else:
+                    # Origin servers expect an origin-form request target
+                    url = urlparse(target)
+                    upstream_reader, upstream_writer = await open_proxy_tunnel(
+                        upstream, url.hostname, url.port or 80, self.connect_timeout)
+                    path = (url.path or '/') + (f"?{url.query}" if url.query else '')
+                    start_line = raw.decode('latin-1').split('\r\n', 1)[0].replace(target, path, 1)
+                    head = self.rewrite_head(raw, 'close', start_line)
+                    upstream_writer.write(head)
+                    self.account(upstream, sent=len(head))
+                    await upstream_writer.drain()
+            except (ConnectionError, OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+                writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                await writer.drain()
+                return
+                
+            await asyncio.gather(
+                self.pipe(reader, upstream_writer, lambda n: self.account(upstream, sent=n)),
+                self.pipe(upstream_reader, writer, lambda n: self.account(upstream, received=n))
+            )
+        finally:
+            if upstream_writer:
+                upstream_writer.close()
+            
+    async def pipe(self, reader, writer, count=None):
+        """Relay bytes in one direction until EOF or idle timeout"""
+        try:
+            while True:
+                data = await asyncio.wait_for(reader.read(65536), self.idle_timeout)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+                if count:
+                    count(len(data))
+            if writer.can_write_eof():
+                writer.write_eof()
+        except (ConnectionError, OSError, asyncio.TimeoutError):
+            writer.close()
+
+# ===== STAGE TIMING =====
+class StageTimer:
+    """Rolling timing samples per named stage"""
+    
+    def __init__(self, max_samples=200):
+        self.max_samples = max_samples
+        self.samples = {}
+        self.lock = threading.Lock()
+        
+    @contextmanager
+    def span(self, stage):
+        """Time the enclosed block as one sample of stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - start) * 1000)
+            
+    def record(self, stage, elapsed_ms):
+        with self.lock:
+            samples = self.samples.get(stage)
+            if samples is None:
+                samples = self.samples[stage] = deque(maxlen=self.max_samples)
+            samples.append(elapsed_ms)
+            
+    def summary(self, limit=10):
+        """Return (stage, count, avg, p95, max) rows, slowest average first"""
+        with self.lock:
+            snapshot = {stage: sorted(samples) for stage, samples in self.samples.items()}
+        rows = []
+        for stage, samples in snapshot.items():
+            p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+            rows.append((stage, len(samples), sum(samples) / len(samples), p95, samples[-1]))
+        rows.sort(key=lambda row: -row[2])
+        return rows[:limit]
+
+# ===== METRICS REGISTRY =====
+class MetricsRegistry:
+    """Counters, gauges and histograms rendered in Prometheus text format"""
+    
+    BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)  # milliseconds
+    
+    def __init__(self):
+        self.help = {}
+        self.gauges = {}
+        self.collectors = []
+        self.local = threading.local()
+        self.shards = []       # (thread, counters, histograms) per writing thread
+        self.retired = ({}, {})  # totals folded in from threads that have exited
+        self.lock = threading.Lock()  # taken once per thread and at scrape time only
+        
+    def describe(self, name, kind, text):
+        self.help[name] = (kind, text)
+        
+    def _shard(self):
+        shard = getattr(self.local, 'shard', None)
+        if shard is None:
+            shard = ({}, {})
+            self.local.shard = shard
+            with self.lock:
+                # Short-lived executor threads come and go without scrapes, so retire them here too
+                self._retire_dead()
+                self.shards.append((threading.current_thread(), *shard))
+        return shard
+        
+    def _retire_dead(self):
+        """Fold shards of exited threads into the retired totals; caller holds the lock"""
+        live = []
+        for thread, shard_counters, shard_histograms in self.shards:
+            if thread.is_alive():
+                live.append((thread, shard_counters, shard_histograms))
+            else:
+                self._merge(self.retired[0], shard_counters, False)
+                self._merge(self.retired[1], shard_histograms, True)
+        self.shards = live
+        
+    def inc(self, name, value=1, **labels):
+        """Add to a counter in this thread's own shard, without locking"""
+        counters = self._shard()[0]
+        key = (name, tuple(sorted(labels.items())))
+        counters[key] = counters.get(key, 0) + value
+        
+    def observe(self, name, value, **labels):
+        """Record a histogram sample in this thread's own shard, without locking"""
+        histograms = self._shard()[1]
+        key = (name, tuple(sorted(labels.items())))
+        buckets = histograms.get(key)
+        if buckets is None:
+            # One slot per bucket plus +Inf, then sum and count
+            buckets = histograms[key] = [0] * (len(self.BUCKETS) + 3)
+        buckets[bisect.bisect_left(self.BUCKETS, value)] += 1
+        buckets[-2] += value
+        buckets[-1] += 1
+        
+    def set(self, name, value, **labels):
+        self.gauges[(name, tuple(sorted(labels.items())))] = value
+        
+    def clear_gauge(self, name):
+        for key in [key for key in self.gauges if key[0] == name]:
+            self.gauges.pop(key, None)
+            
+    def add_collector(self, func):
+        """Register a callback that refreshes gauges right before each scrape"""
+        self.collectors.append(func)
+        
+    def _merge(self, into, source, histogram):
+        for key, value in dict(source).items():
+            if histogram:
+                total = into.setdefault(key, [0] * len(value))
+                for i, count in enumerate(value):
+                    total[i] += count
+            else:
+                into[key] = into.get(key, 0) + value
+                
+    def snapshot(self):
+        """Return merged (counters, histograms) across all thread shards"""
+        counters, histograms = {}, {}
+        with self.lock:
+            self._retire_dead()
+            self._merge(counters, self.retired[0], False)
+            self._merge(histograms, self.retired[1], True)
+            for _, shard_counters, shard_histograms in self.shards:
+                self._merge(counters, shard_counters, False)
+                self._merge(histograms, shard_histograms, True)
+        return counters, histograms
+        
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        escape = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in pairs) + '}'
+        
+    def render(self):
+        """Render every metric in the Prometheus text exposition format"""
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception:
+                pass
+        counters, histograms = self.snapshot()
+        families = {}
+        for (name, labels), value in counters.items():
+            families.setdefault((name, 'counter'), []).append(f"{name}{self._labels(labels)} {value}")
+        for (name, labels), value in list(self.gauges.items()):
+            families.setdefault((name, 'gauge'), []).append(f"{name}{self._labels(labels)} {value}")
+        for (name, labels), buckets in histograms.items():
+            lines = families.setdefault((name, 'histogram'), [])
+            cumulative = 0
+            for bound, count in zip(self.BUCKETS + ('+Inf',), buckets):
+                cumulative += count
+                lines.append(f"{name}_bucket{self._labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{self._labels(labels)} {buckets[-2]}")
+            lines.append(f"{name}_count{self._labels(labels)} {buckets[-1]}")
+            
+        output = []
+        for (name, kind), lines in sorted(families.items()):
+            text = self.help.get(name, (kind, name))[1]
+            output.append(f"# HELP {name} {text}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(sorted(lines) if kind != 'histogram' else lines)
+        return '\n'.join(output) + '\n'
 
-# ===== STUNNING CREATIVE BANNER =====
-def display_banner():
-    print(Fore.MAGENTA)
-    print("  ██╗██████╗      ██████╗  ██████╗ ████████╗ ██████╗ ██████╗ ███████╗")
-    print("  ██║██╔══██╗    ██╔════╝ ██╔═══██╗╚══██╔══╝██╔═══██╗██╔══██╗██╔════╝")
-    print("  ██║██████╔╝    ██║  ███╗██║   ██║   ██║   ██║   ██║██████╔╝█████╗  ")
-    print("  ██║██╔═══╝     ██║   ██║██║   ██║   ██║   ██║   ██║██╔═══╝ ██╔══╝  ")
-    print("  ██║██║         ╚██████╔╝╚██████╔╝   ██║   ╚██████╔╝██║     ███████╗")
-    print("  ╚═╝╚═╝          ╚═════╝  ╚═════╝    ╚═╝    ╚═════╝ ╚═╝     ╚══════╝")
-    print(Fore.CYAN)
-    print("██████╗ ██████╗  ██████╗ ██╗  ██╗   ██╗    ███████╗ ██████╗██████╗ ██╗██████╗ ████████╗")
-    print("██╔══██╗██╔══██╗██╔═══██╗╚██╗██╔╝   ██║    ██╔════╝██╔════╝██╔══██╗██║██╔══██╗╚══██╔══╝")
-    print("██████╔╝██████╔╝██║   ██║ ╚███╔╝    ██║    ███████╗██║     ██████╔╝██║██████╔╝   ██║   ")
-    print("██╔═══╝ ██╔══██╗██║   ██║ ██╔██╗    ██║    ╚════██║██║     ██╔══██╗██║██╔═══╝    ██║   ")
-    print("██║     ██║  ██║╚██████╔╝██╔╝ ██╗   ██║    ███████║╚██████╗██║  ██║██║██║        ██║   ")
-    print("╚═╝     ╚═╝  ╚═╝ ╚═════╝ ╚═╝  ╚═╝   ╚═╝    ╚══════╝ ╚═════╝╚═╝  ╚═╝╚═╝╚═╝        ╚═╝   ")
-    print(Fore.YELLOW)
-    print("="*80)
-    print(f"Version: {VERSION} | Author: {Fore.RED}Aryan{Fore.YELLOW}".center(80))
-    print("="*80)
-    print("Enterprise-Grade Proxy Management & Network Security Solution".center(80))
-    print("="*80)
-    print(Fore.RESET)
+class MetricsServer:
+    """Serves the registry on /metrics from a background thread"""
+    
+    def __init__(self, registry, host=METRICS_HOST, port=METRICS_PORT):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+        
+    def start(self):
+        registry = self.registry
+        
+        class Handler(http_server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                
+            def log_message(self, format, *args):
+                pass
+                
+        self.server = http_server.ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+# ===== JOB SCHEDULER =====
+class Scheduler:
+    """One timer heap for every periodic job, with coalesced probes"""
+    
+    def __init__(self, clock=time.monotonic, probe_window=5, workers=4, autostart=True):
+        self.clock = clock                # injectable so tests can drive time by hand
+        self.probe_window = probe_window  # seconds a finished probe result is shared
+        self.workers = workers
+        self.autostart = autostart        # False: no timer thread, jobs run only via run_pending()
+        self.heap = []
+        self.jobs = {}
+        self.probes = {}
+        self.seq = 0
+        self.cond = threading.Condition()
+        self.probe_lock = threading.Lock()
+        self.executor = None
+        self.thread = None
+        self.stopping = False
+        
+    def every(self, name, interval, func, delay=None):
+        """Schedule func every interval seconds, replacing any job with the same name"""
+        # func may return a number to override the next delay, or False to end the job
+        with self.cond:
+            self.seq += 1
+            self.jobs[name] = {'func': func, 'interval': interval, 'version': self.seq}
+            heapq.heappush(self.heap, (self.clock() + (interval if delay is None else delay), self.seq, name))
+            self.cond.notify()
+        if self.autostart:
+            self.start()
+        
+    def cancel(self, name):
+        """Drop a job; a run already in progress finishes but is not rescheduled"""
+        with self.cond:
+            return self.jobs.pop(name, None) is not None
+            
+    def scheduled(self, name):
+        return name in self.jobs
+        
+    def _pop_due(self):
+        now = self.clock()
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            _, version, name = heapq.heappop(self.heap)
+            job = self.jobs.get(name)
+            # Entries of cancelled or replaced jobs are skipped
+            if job is not None and job['version'] == version:
+                due.append((name, job))
+        return due
+        
+    def _run(self, name, job):
+        try:
+            result = job['func']()
+        except Exception as e:
+            job['error'] = str(e)
+            result = None
+        with self.cond:
+            if self.jobs.get(name) is not job:
+                return
+            if result is False:
+                del self.jobs[name]
+                return
+            self.seq += 1
+            job['version'] = self.seq
+            delay = job['interval'] if result is None else result
+            heapq.heappush(self.heap, (self.clock() + delay, self.seq, name))
+            self.cond.notify()
+            
+    def run_pending(self):
+        """Run due jobs inline and return how many ran; used with a simulated clock"""
+        with self.cond:
+            due = self._pop_due()
+        for name, job in due:
+            self._run(name, job)
+        return len(due)
+        
+    def start(self):
+        """Start the timer thread if it is not running"""
+        with self.cond:
+            if self.thread:
+                return
+            self.stopping = False
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+            
+    def run(self):
+        while True:
+            with self.cond:
+                due = self._pop_due()
+                while not due and not self.stopping:
+                    timeout = self.heap[0][0] - self.clock() if self.heap else None
+                    self.cond.wait(timeout)
+                    due = self._pop_due()
+                if self.stopping:
+                    return
+                executor = self.executor
+            for name, job in due:
+                try:
+                    executor.submit(self._run, name, job)
+                except RuntimeError:
+                    return  # stop() shut the executor down meanwhile
+                
+    def stop(self, timeout=5):
+        """Cancel every job and stop the timer thread"""
+        with self.cond:
+            self.stopping = True
+            self.jobs.clear()
+            self.heap = []
+            self.cond.notify()
+        if self.thread:
+            self.thread.join(timeout)
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        self.thread = None
+        self.executor = None
+        
+    def probe(self, key, func):
+        """Run func for key, sharing an in-flight or recent result instead of repeating it"""
+        with self.probe_lock:
+            now = self.clock()
+            entry = self.probes.get(key)
+            shared = entry and (entry['finished'] is None or now - entry['finished'] < self.probe_window)
+            if not shared:
+                if len(self.probes) > 256:
+                    self.probes = {k: e for k, e in self.probes.items()
+                                   if e['finished'] is None or now - e['finished'] < self.probe_window}
+                entry = {'event': threading.Event(), 'result': None, 'finished': None}
+                self.probes[key] = entry
+        if shared:
+            entry['event'].wait()
+            return entry['result']
+        try:
+            entry['result'] = func()
+        finally:
+            entry['finished'] = self.clock()
+            entry['event'].set()
+        return entry['result']
+
+# ===== CONTROL SOCKET =====
+class ControlServer:
+    """Line-delimited JSON command server on a Unix-domain socket"""
+    
+    def __init__(self, path, handler):
+        self.path = path
+        self.handler = handler
+        self.server = None
+        self.thread = None
+        
+    def start(self):
+        """Bind the socket (replacing a stale one) and serve in the background"""
+        if os.path.exists(self.path):
+            if self.alive():
+                raise RuntimeError(f"another daemon is listening on {self.path}")
+            os.unlink(self.path)
+            
+        dispatch = self.dispatch
+        
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                # One command per line; clients may keep the connection open
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    self.wfile.write(json.dumps(dispatch(line), default=dict).encode() + b'\n')
+                    
+        # Create the socket owner-only; a chmod after bind leaves a window where others can connect
+        umask = os.umask(0o177)
+        try:
+            self.server = socketserver.ThreadingUnixStreamServer(self.path, Handler)
+        finally:
+            os.umask(umask)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        
+    def alive(self):
+        """Check whether something is already answering on the socket"""
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(1)
+                sock.connect(self.path)
+            return True
+        except OSError:
+            return False
+            
+    def dispatch(self, line):
+        """Parse a request line and run it through the handler"""
+        try:
+            text = line.decode('utf-8').strip()
+            if text.startswith('{'):
+                request = json.loads(text)
+                cmd, args = request.get('cmd', ''), request.get('args', [])
+            else:
+                cmd, *args = text.split()
+            return self.handler(cmd, args)
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+            
+    def stop(self):
+        """Stop serving and remove the socket file"""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+            
+def control_request(path, cmd, args=(), timeout=30):
+    """Send one command to a running daemon and return its reply"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(json.dumps({"cmd": cmd, "args": list(args)}).encode() + b'\n')
+        reply = sock.makefile('rb').readline()
+    if not reply:
+        raise ConnectionError("daemon closed the connection")
+    return json.loads(reply)
 
 # ===== ENHANCED IP ALCHEMIST =====
 class IPAlchemist:
     def __init__(self):
-        self.proxies = []
+        self.registry = ProxyRegistry()
         self.tor_bridges = []
         self.current_proxy = None
-        self.favorites = []
         self.rotation_active = False
-        self.rotation_thread = None
         self.local_proxy_active = False
-        self.local_proxy_thread = None
+        self.local_proxy_server = None
+        self.active_pipeline = None
+        self.pipeline_lock = threading.Lock()  # guards starting a pipeline vs. joining the running one
+        self.control_server = None
+        self.control_lock = threading.Lock()
+        self.daemon_stop = threading.Event()
+        self.restored = threading.Event()  # cleared while restore_session runs
+        self.restored.set()
+        self.started_at = time.time()
         self.config = {
             "api_url": PROXY_API_URL,
             "max_latency": 2000,
@@ -113,55 +2372,309 @@ class IPAlchemist:
             "proxy_geofencing": False,
             "proxy_auto_benchmark": False,
             "proxy_anonymity_level": "elite",
-            "proxy_encrypted_storage": False
+            "proxy_encrypted_storage": False,
+            "parallel_search": True,
+            "search_workers": 8,
+            "search_deadline": 20,  # seconds
+            "validate_after_fetch": False,
+            "validate_concurrency": 100,
+            "validate_timeout": 5,  # seconds
+            "pool_max_per_upstream": 8,
+            "pool_idle_timeout": 30,  # seconds
+            "session_cache_size": 32,
+            "session_pool_size": 4,
+            "api_pages": 1,
+            "api_page_concurrency": 4,
+            "api_page_retries": 2,
+            "streaming_pipeline": True,
+            "stream_validate_limit": 10,
+            "cache_ttl": 360,  # minutes
+            "warm_start": True,
+            "warm_start_window": 30,  # minutes
+            "geoip_cache_size": 4096,
+            "probe_coalesce_window": 5,  # seconds
+            "standby_size": 5,
+            "standby_max_age": 120,  # seconds
+            "standby_refill_interval": 20,  # seconds
+            "profile_rotations": False,
+            "metrics_enabled": False,
+            "metrics_port": METRICS_PORT,
+            "quarantine_base": 60,  # seconds benched after a first failed probe
+            "quarantine_max": 3600,  # seconds, cap on the doubling backoff
+            "adaptive_timeouts": True,
+            "timeout_floor": 1.0,  # seconds
+            "timeout_ceiling": 8.0,  # seconds
+            "timeout_margin": 1.5,  # multiplier on a proxy's p95 latency
+            "hedged_probes": True,
+            "hedge_min_delay": 0.2  # seconds before a slow probe may be hedged
         }
         self.load_config()
         self.setup_directories()
+        self.logger = BatchLogger(LOG_FILE, "logs")
         self.load_favorites()
         self.load_history()
+        self.scorer = ProxyScorer()
+        self.sessions = SessionManager(self.config['session_cache_size'], self.config['session_pool_size'])
+        self.timings = StageTimer()
+        self.metrics = MetricsRegistry()
+        self.metrics_server = None
+        self.setup_metrics()
+        self.scheduler = Scheduler(probe_window=self.config['probe_coalesce_window'])
+        self.standby = StandbyPool(self.config['standby_size'], self.config['standby_max_age'])
+        self.quarantine = Quarantine(self.config['quarantine_base'], max_backoff=self.config['quarantine_max'])
         self.traffic_stats = {"sent": 0, "received": 0}
         self.proxy_uptime = {}
-        self.blacklist = []
-        self.geoip_reader = self.init_geoip()
+        self.geoip = GeoIPEnricher(GEOIP_DB_PATH, GEOIP_ASN_DB_PATH, self.config.get('geoip_cache_size', 4096))
         self.setup_databases()
+        self.cache_store = ProxyCacheStore(self.cache_db, self.config['cache_ttl'] * 60)
         signal.signal(signal.SIGINT, self.signal_handler)
         
-    def init_geoip(self):
-        if os.path.exists(GEOIP_DB_PATH):
-            try:
-                return geoip2.database.Reader(GEOIP_DB_PATH)
-            except:
-                print(f"{Fore.YELLOW}⚠️ Error loading GeoIP database{Style.RESET_ALL}")
-                return None
-        return None
+    @property
+    def proxies(self):
+        """The proxy pool as a columnar ProxyTable (iterates as dict-like records)"""
+        return self.registry.proxies
+        
+    @proxies.setter
+    def proxies(self, proxies):
+        self.registry.replace(proxies)
+        
+    @property
+    def favorites(self):
+        """Favorite entries in the order they were added (the favorites.json list)"""
+        return self.registry.favorites
+        
+    @favorites.setter
+    def favorites(self, favorites):
+        self.registry.set_favorites(favorites)
+        
+    @property
+    def blacklist(self):
+        return self.registry.blacklist
+        
+    @blacklist.setter
+    def blacklist(self, keys):
+        self.registry.set_blacklist(keys)
+        
+    def enrich_proxies(self, proxies):
+        """Add country, city, coordinates and ASN from the local GeoIP databases"""
+        start = time.perf_counter()
+        enriched = self.geoip.enrich(proxies)
+        if enriched:
+            self.log(f"GeoIP enriched {enriched}/{len(proxies)} proxies in "
+                     f"{(time.perf_counter() - start) * 1000:.0f} ms (cache {self.geoip.hits} hits, {self.geoip.misses} misses)")
+        return enriched
         
     def setup_databases(self):
         """Initialize databases for traffic and fingerprints"""
-        # Traffic database
-        conn = sqlite3.connect(TRAFFIC_DB)
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS traffic
-                     (timestamp DATETIME, sent INTEGER, received INTEGER, proxy TEXT)''')
-        conn.commit()
-        conn.close()
-        
-        # Fingerprint database
-        conn = sqlite3.connect(FINGERPRINT_DB)
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS fingerprints
-                     (id INTEGER PRIMARY KEY, user_agent TEXT, platform TEXT, 
-                     language TEXT, timezone TEXT, screen TEXT, fonts TEXT, 
-                     canvas_hash TEXT, webgl_hash TEXT, created DATETIME)''')
-        conn.commit()
-        conn.close()
+        # Long-lived connections, shared by every caller
+        self.traffic_db = Database(TRAFFIC_DB)
+        self.cache_db = Database(PROXY_CACHE_DB)
+        self._fingerprint_db = None
         
-    def signal_handler(self, signum, frame):
-        print(f"\n{Fore.RED}🛑 Interrupt received! Shutting down...{Style.RESET_ALL}")
+        # Traffic database (schema, rollups and batched writes live in the meter)
+        self.traffic_meter = TrafficMeter(self.traffic_db)
+        
+    @property
+    def fingerprint_db(self):
+        """Fingerprint database, opened on first use"""
+        if self._fingerprint_db is None:
+            db = Database(FINGERPRINT_DB)
+            with db.transaction() as conn:
+                conn.execute('''CREATE TABLE IF NOT EXISTS fingerprints
+                                (id INTEGER PRIMARY KEY, user_agent TEXT, platform TEXT, 
+                                language TEXT, timezone TEXT, screen TEXT, fonts TEXT, 
+                                canvas_hash TEXT, webgl_hash TEXT, created DATETIME)''')
+            self._fingerprint_db = db
+        return self._fingerprint_db
+            
+    def close_databases(self):
+        """Flush pending writes and close every database connection"""
+        self.traffic_meter.close()
+        for db in (self.traffic_db, self._fingerprint_db, self.cache_db):
+            if db:
+                db.close()
+        self.geoip.close()
+        
+    def record_traffic(self, proxy, sent=0, received=0):
+        """Account bytes relayed or probed through a proxy"""
+        self.traffic_stats['sent'] += sent
+        self.traffic_stats['received'] += received
+        self.traffic_meter.record(f"{proxy['host']}:{proxy['port']}", sent, received)
+        if sent:
+            self.metrics.inc('ip_alchemist_bytes_total', sent, direction='sent')
+        if received:
+            self.metrics.inc('ip_alchemist_bytes_total', received, direction='received')
+            
+    def setup_metrics(self):
+        """Describe exported metrics and register scrape-time gauges"""
+        describe = self.metrics.describe
+        describe('ip_alchemist_probes_total', 'counter', 'Proxy probes attempted')
+        describe('ip_alchemist_probe_successes_total', 'counter', 'Proxy probes that succeeded')
+        describe('ip_alchemist_probe_latency_ms', 'histogram', 'Latency of successful probes in milliseconds')
+        describe('ip_alchemist_rotations_total', 'counter', 'Rotations by outcome and proxy source')
+        describe('ip_alchemist_rotation_duration_ms', 'histogram', 'Time to complete a rotation in milliseconds')
+        describe('ip_alchemist_bytes_total', 'counter', 'Bytes relayed or probed through proxies')
+        describe('ip_alchemist_pool_proxies', 'gauge', 'Proxies in the pool by country and protocol')
+        describe('ip_alchemist_standby_proxies', 'gauge', 'Validated proxies ready in the standby pool')
+        describe('ip_alchemist_quarantined_proxies', 'gauge', 'Proxies benched after failed probes')
+        describe('ip_alchemist_current_proxy_up', 'gauge', '1 when a proxy is active')
+        
+        def collect_pool():
+            self.metrics.clear_gauge('ip_alchemist_pool_proxies')
+            counts = {}
+            for (country, protocol), count in self.registry.counts().items():
+                key = (country or 'unknown', protocol)  # no country and empty country share a label
+                counts[key] = counts.get(key, 0) + count
+            for (country, protocol), count in counts.items():
+                self.metrics.set('ip_alchemist_pool_proxies', count, country=country, protocol=protocol)
+            self.metrics.set('ip_alchemist_standby_proxies', len(self.standby))
+            self.metrics.set('ip_alchemist_quarantined_proxies', len(self.quarantine))
+            self.metrics.set('ip_alchemist_current_proxy_up', 1 if self.current_proxy else 0)
+            
+        self.metrics.add_collector(collect_pool)
+        
+    def observe_probe(self, proxy, result):
+        """Fold one probe outcome into the score, the quarantine and the metrics"""
+        self.scorer.record(proxy, result['working'], result.get('latency'))
+        if result['working']:
+            self.quarantine.succeed(proxy)
+        else:
+            self.quarantine.fail(proxy)
+        self.metrics.inc('ip_alchemist_probes_total')
+        if result['working']:
+            self.metrics.inc('ip_alchemist_probe_successes_total')
+            if result.get('latency') is not None:
+                self.metrics.observe('ip_alchemist_probe_latency_ms', result['latency'])
+                
+    def start_metrics_server(self, port=None):
+        """Expose metrics for Prometheus on a local port"""
+        if self.metrics_server:
+            return True
+        try:
+            port = self.config.get('metrics_port', METRICS_PORT) if port is None else port
+            server = MetricsServer(self.metrics, METRICS_HOST, port)
+            server.start()
+            self.metrics_server = server
+            print(f"{Fore.GREEN}📈 Metrics at http://{METRICS_HOST}:{server.port}/metrics{Style.RESET_ALL}")
+            self.log(f"Metrics endpoint started on {METRICS_HOST}:{server.port}")
+            return True
+        except Exception as e:
+            print(f"{Fore.RED}❌ Failed to start metrics endpoint: {str(e)}{Style.RESET_ALL}")
+            return False
+        
+    def handle_control(self, cmd, args):
+        """Run a control-socket command against the live in-memory state"""
+        cmd = cmd.lower()
+        if cmd == 'ping':
+            return {"ok": True}
+        if cmd == 'status':
+            return {
+                "ok": True,
+                "proxy": self.current_proxy,
+                "pool": len(self.proxies),
+                "quarantined": len(self.quarantine),
+                "rotation": self.rotation_active,
+                "local_proxy": self.local_proxy_active,
+                "uptime": round(time.time() - self.started_at)
+            }
+        if cmd == 'stats':
+            sent, received = self.traffic_meter.totals()
+            return {
+                "ok": True,
+                "session": dict(self.traffic_stats),
+                "total": {"sent": sent or 0, "received": received or 0},
+                "pool": len(self.proxies),
+                "tracked": len(self.scorer.stats),
+                "stages": {stage: {"count": count, "avg_ms": round(avg, 1), "p95_ms": round(p95, 1)}
+                           for stage, count, avg, p95, _ in self.timings.summary(20)}
+            }
+        if cmd == 'shutdown':
+            self.daemon_stop.set()
+            return {"ok": True}
+            
+        # Commands that change the active proxy or pool run one at a time
+        with self.control_lock:
+            if cmd == 'rotate':
+                proxy = self.rotate_proxy(args[0].upper() if args else None)
+                if not proxy:
+                    return {"ok": False, "error": "no working proxy found"}
+                return {"ok": True, "proxy": proxy}
+            if cmd == 'fetch':
+                if not self.fetch_live_proxies():
+                    return {"ok": False, "error": "fetch failed"}
+                return {"ok": True, "pool": len(self.proxies)}
+            if cmd == 'set-proxy':
+                if not args or ':' not in args[0]:
+                    return {"ok": False, "error": "usage: set-proxy HOST:PORT [PROTOCOL]"}
+                host, port = args[0].rsplit(':', 1)
+                if not port.isdigit():
+                    return {"ok": False, "error": f"invalid port: {port}"}
+                record = self.registry.lookup(host, port)
+                if record is None:
+                    proxy = {"host": host, "port": port, "protocol": args[1] if len(args) > 1 else 'http',
+                             "ip": host, "country": "Unknown"}
+                else:
+                    # Unvalidated pool entries have no exit IP yet; don't hand out the live table row
+                    proxy = {**record, "ip": record.get('ip', host)}
+                if not self.set_termux_proxy(proxy):
+                    return {"ok": False, "error": "failed to apply proxy"}
+                return {"ok": True, "proxy": proxy}
+            if cmd == 'ban':
+                if not args or ':' not in args[0] or not args[0].rsplit(':', 1)[1].isdigit():
+                    return {"ok": False, "error": "usage: ban HOST:PORT"}
+                host, port = args[0].rsplit(':', 1)
+                proxy = {"host": host, "port": int(port)}
+                self.registry.ban(proxy)
+                self.scorer.discard(proxy)
+                self.standby.discard(proxy)
+                self.save_state()
+                return {"ok": True, "pool": len(self.proxies), "blacklist": len(self.blacklist)}
+        return {"ok": False, "error": f"unknown command: {cmd}"}
+        
+    def run_daemon(self, path=CONTROL_SOCKET):
+        """Serve control commands until shutdown, keeping all state warm"""
+        self.restore_session()
+        self.control_server = ControlServer(path, self.handle_control)
+        try:
+            self.control_server.start()
+        except Exception as e:
+            print(f"{Fore.RED}❌ Failed to start control socket: {str(e)}{Style.RESET_ALL}")
+            return False
+            
+        signal.signal(signal.SIGINT, lambda signum, frame: self.daemon_stop.set())
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.daemon_stop.set())
+        if self.config.get('auto_start', False):
+            self.start_rotation(self.config.get('rotation_interval', 5), self.config.get('rotation_duration', 1))
+        self.start_standby()
+        self.log(f"Daemon listening on {path}")
+        print(f"{Fore.GREEN}✅ Daemon listening on {path}{Style.RESET_ALL}")
+        
+        while not self.daemon_stop.wait(1):
+            pass
+            
+        print(f"\n{Fore.RED}🛑 Daemon shutting down...{Style.RESET_ALL}")
+        self.control_server.stop()
+        self.shutdown()
+        return True
+        
+    def shutdown(self):
+        """Stop background work and servers, then flush state, databases and logs"""
         self.stop_rotation()
+        self.scheduler.stop()
         if self.local_proxy_active:
             self.stop_local_proxy()
-        self.disable_kill_switch()
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
         self.save_state()
+        self.sessions.close_all()
+        self.close_databases()
+        self.logger.close()
+        
+    def signal_handler(self, signum, frame):
+        print(f"\n{Fore.RED}🛑 Interrupt received! Shutting down...{Style.RESET_ALL}")
+        self.disable_kill_switch()
+        self.shutdown()
         sys.exit(0)
         
     def setup_directories(self):
@@ -230,20 +2743,35 @@ class IPAlchemist:
             
     def save_state(self):
         """Save current state for persistence"""
+        # Saving mid-restore would overwrite state.json with a still-empty pool
+        if not self.restored.wait(10):
+            print(f"{Fore.YELLOW}⚠️ Session restore still running, state not saved{Style.RESET_ALL}")
+            return
         state = {
             "current_proxy": self.current_proxy,
-            "proxies": self.proxies,
+            "proxies": self.proxies.to_dicts(),
             "traffic_stats": self.traffic_stats,
             "proxy_uptime": self.proxy_uptime,
-            "blacklist": self.blacklist
+            "blacklist": self.blacklist,
+            "quarantine": self.quarantine.to_dict()
         }
         try:
             with open('state.json', 'w') as f:
-                json.dump(state, f, indent=4)
+                json.dump(state, f, indent=4, default=dict)
             print(f"{Fore.CYAN}💾 Application state saved{Style.RESET_ALL}")
         except Exception as e:
             print(f"{Fore.RED}❌ Failed to save state: {str(e)}{Style.RESET_ALL}")
             
+    def restore_session(self):
+        """Load saved state and warm the proxy pool"""
+        self.restored.clear()
+        try:
+            self.load_state()
+            if self.config.get('warm_start', True):
+                self.warm_start()
+        finally:
+            self.restored.set()
+            
     def load_state(self):
         """Load previous application state"""
         if os.path.exists('state.json'):
@@ -252,62 +2780,91 @@ class IPAlchemist:
                     state = json.load(f)
                 self.current_proxy = state.get("current_proxy")
                 self.proxies = state.get("proxies", [])
+                self.scorer.sync(self.proxies)
                 self.traffic_stats = state.get("traffic_stats", {"sent": 0, "received": 0})
                 self.proxy_uptime = state.get("proxy_uptime", {})
                 self.blacklist = state.get("blacklist", [])
+                self.quarantine.load(state.get("quarantine", {}))
                 print(f"{Fore.GREEN}✅ Application state loaded{Style.RESET_ALL}")
             except Exception as e:
                 print(f"{Fore.YELLOW}⚠️ Error loading state: {str(e)}{Style.RESET_ALL}")
                 
+    def warm_start(self):
+        """Serve from recently validated cached proxies and revalidate in the background"""
+        window = self.config.get('warm_start_window', 30)
+        try:
+            cached = self.cache_store.recently_validated(window)
+        except Exception as e:
+            self.log(f"Warm start failed: {str(e)}")
+            cached = []
+        if not cached:
+            print(f"{Fore.YELLOW}⚠️ No proxies validated in the last {window} min, cold start{Style.RESET_ALL}")
+            return False
+            
+        self.enrich_proxies(cached)
+        cached_keys = set()
+        for proxy in cached:
+            proxy['is_favorite'] = self.registry.is_favorite(proxy['host'])
+            cached_keys.add(f"{proxy['host']}:{proxy['port']}")
+            
+        # Freshest proxies first, then whatever the saved state still had
+        self.proxies = cached + [p for p in self.proxies if f"{p['host']}:{p['port']}" not in cached_keys]
+        self.scorer.sync(self.proxies)
+        for proxy in cached:
+            self.scorer.record(proxy, True, proxy.get('measured_latency'))
+            
+        print(f"{Fore.GREEN}⚡ Warm start: {len(cached)} proxies validated in the last {window} min{Style.RESET_ALL}")
+        self.log(f"Warm start with {len(cached)} cached proxies")
+        threading.Thread(target=self.background_refresh, daemon=True).start()
+        return True
+
+    def background_refresh(self):
+        """Revalidate the warm pool, then refresh it from the API keeping proven proxies"""
+        try:
+            working = self.validate_all_proxies()
+            if self.fetch_live_proxies():
+                # Proxies we just proved working stay ahead of the fresh, untested ones
+                keys = {f"{p['host']}:{p['port']}" for p in working}
+                self.proxies = working + [p for p in self.proxies if f"{p['host']}:{p['port']}" not in keys]
+                self.scorer.sync(self.proxies)
+        except Exception as e:
+            self.log(f"Background refresh failed: {str(e)}")
+
     def fetch_live_proxies(self):
         """Get fresh proxies from API"""
         try:
-            print(f"{Fore.BLUE}🌐 Fetching proxies from {self.config['api_url']}{Style.RESET_ALL}")
-            headers = {
-                'User-Agent': self.generate_random_user_agent(),
-                'Accept': 'application/json'
-            }
-            response = requests.get(
-                self.config['api_url'], 
-                headers=headers,
-                timeout=30
-            )
-            data = response.json()
+            pages = max(1, int(self.config.get('api_pages', 1)))
+            print(f"{Fore.BLUE}🌐 Fetching {pages} page(s) from {self.config['api_url']}{Style.RESET_ALL}")
             
-            if 'data' not in data:
-                print(f"{Fore.YELLOW}⚠️ API format changed! Check documentation{Style.RESET_ALL}")
-                return False
-                
-            self.proxies = []
-            for proxy in data['data']:
-                # Filter by latency
-                if proxy['latency'] > self.config['max_latency']:
-                    continue
-                    
-                # Filter by country preference
-                if (self.config['favorite_countries'] and 
-                    proxy['country'] not in self.config['favorite_countries']):
-                    continue
+            # Pages are filtered as soon as each one arrives
+            proxies, failed = ProxyTable(), 0
+            with self.timings.span('fetch'):
+                for page, entries in self.iter_api_pages(pages):
+                    if entries is None:
+                        failed += 1
+                        continue
+                    with self.timings.span('fetch.filter'):
+                        proxies.extend(self.filter_api_proxies(entries, proxies))
+                            
+                if failed == pages:
+                    print(f"{Fore.RED}❌ Proxy fetch error: no page could be loaded{Style.RESET_ALL}")
+                    return False
                     
-                # Use first available protocol
-                for protocol in self.config['protocol_preference']:
-                    if protocol in proxy['protocols']:
-                        self.proxies.append({
-                            'host': proxy['ip'],
-                            'port': proxy['port'],
-                            'protocol': protocol,
-                            'country': proxy['country'],
-                            'latency': proxy['latency'],
-                            'last_checked': proxy['lastChecked'],
-                            'is_favorite': any(fav['host'] == proxy['ip'] for fav in self.favorites)
-                        })
-                        break
-                        
-            print(f"{Fore.GREEN}✅ Loaded {len(self.proxies)} filtered proxies{Style.RESET_ALL}")
-            self.log(f"Fetched {len(self.proxies)} proxies from API")
+                # Keep the first sighting of every endpoint
+                proxies = proxies.take(range(len(proxies)), dedupe=True)
+                with self.timings.span('fetch.enrich'):
+                    self.enrich_proxies(proxies)
+                self.proxies = proxies
+                self.scorer.sync(self.proxies)
+                print(f"{Fore.GREEN}✅ Loaded {len(self.proxies)} filtered proxies{Style.RESET_ALL}")
+                self.log(f"Fetched {len(self.proxies)} proxies from API ({pages - failed}/{pages} pages)")
+                
+                # Cache proxies
+                with self.timings.span('fetch.cache'):
+                    self.cache_proxies()
             
-            # Cache proxies
-            self.cache_proxies()
+            if self.config.get('validate_after_fetch', False):
+                self.validate_all_proxies()
             return True
             
         except Exception as e:
@@ -315,11 +2872,165 @@ class IPAlchemist:
             print(f"{Fore.RED}❌ Proxy fetch error: {str(e)}{Style.RESET_ALL}")
             return False
 
+    def stream_fetch_proxies(self, timeout=None):
+        """Stream fetch, filter, validate and publish; return the first working proxy early"""
+        with self.pipeline_lock:
+            pipeline = self.active_pipeline
+            if not pipeline:
+                ready = threading.Event()
+                first_working = {}
+                self.active_pipeline = (ready, first_working)
+        if pipeline:
+            # Share the pipeline that is already running
+            ready, first_working = pipeline
+            ready.wait(timeout or self.config.get('search_deadline', 20))
+            return first_working.get('proxy')
+            
+        pages = max(1, int(self.config.get('api_pages', 1)))
+        workers = self.config.get('search_workers', 8)
+        probe_timeout = self.config.get('validate_timeout', 5)
+        wanted = self.config.get('stream_validate_limit', 10)
+        raw_pages = queue.Queue()
+        results = queue.Queue()
+        found = [0]
+        found_lock = threading.Lock()
+        done = object()
+        print(f"{Fore.BLUE}🌊 Streaming {pages} page(s) from {self.config['api_url']}{Style.RESET_ALL}")
+        
+        def fetch_stage():
+            try:
+                for _, entries in self.iter_api_pages(pages):
+                    if entries is not None:
+                        raw_pages.put(entries)
+            finally:
+                raw_pages.put(done)
+                
+        def filter_stage():
+            seen = set()
+            while True:
+                entries = raw_pages.get()
+                if entries is done:
+                    return
+                quarantined = self.quarantine.active()
+                for proxy in self.filter_api_proxies(entries):
+                    key = f"{proxy['host']}:{proxy['port']}"
+                    if key not in seen and key not in quarantined and not self.registry.is_blacklisted(proxy):
+                        seen.add(key)
+                        yield proxy
+                        
+        def probe(proxy):
+            # Once enough proxies work, the rest are published unvalidated
+            if found[0] >= wanted:
+                results.put((proxy, None))
+                return
+            result = self.test_proxy(proxy, timeout=self.probe_timeout(proxy, probe_timeout))
+            if result['working']:
+                with found_lock:
+                    found[0] += 1
+            results.put((proxy, result))
+            
+        def validate_stage():
+            try:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    for proxy in filter_stage():
+                        executor.submit(probe, proxy)
+            finally:
+                results.put(done)
+                
+        def publish_stage():
+            proxies = []
+            try:
+                while True:
+                    item = results.get()
+                    if item is done:
+                        break
+                    proxy, result = item
+                    if result is not None:
+                        proxy['working'] = result['working']
+                        proxy['measured_latency'] = result.get('latency')
+                        proxy['ip'] = result.get('ip')
+                        proxy['validated'] = datetime.now().isoformat()
+                    proxies.append(proxy)
+                    
+                    if result and result['working'] and not ready.is_set():
+                        # Make the pool usable while later pages are still in flight
+                        first_working['proxy'] = {**proxy, **result}
+                        self.proxies = proxies
+                        self.scorer.sync(proxies)
+                        ready.set()
+                        
+                if proxies:
+                    self.enrich_proxies(proxies)
+                    self.proxies = ProxyTable.from_records(proxies).ranked()
+                    self.scorer.sync(self.proxies)
+                    self.cache_proxies()
+                self.log(f"Streamed {len(proxies)} proxies from API, {found[0]} validated working")
+                print(f"{Fore.GREEN}✅ Pipeline finished: {len(proxies)} proxies, {found[0]} working{Style.RESET_ALL}")
+            finally:
+                self.active_pipeline = None
+                ready.set()
+                
+        for stage in (fetch_stage, validate_stage, publish_stage):
+            threading.Thread(target=stage, daemon=True).start()
+            
+        ready.wait(timeout or self.config.get('search_deadline', 20))
+        proxy = first_working.get('proxy')
+        if proxy:
+            print(f"{Fore.GREEN}✅ First working proxy ready: {proxy['ip']} | Latency: {proxy['latency']}ms{Style.RESET_ALL}")
+        return proxy
+
+    def api_page_url(self, page):
+        """Return the configured API URL pointed at another page"""
+        url = urlparse(self.config['api_url'])
+        query = dict(parse_qsl(url.query))
+        query['page'] = str(page)
+        return url._replace(query=urlencode(query)).geturl()
+
+    def fetch_api_page(self, page, headers):
+        """Fetch one API page with retries, returning its proxy entries or None"""
+        retries = self.config.get('api_page_retries', 2)
+        for attempt in range(retries + 1):
+            try:
+                with self.timings.span('fetch.http'):
+                    response = self.sessions.get().get(self.api_page_url(page), headers=headers, timeout=30)
+                with self.timings.span('fetch.parse'):
+                    data = response.json()
+                if 'data' not in data:
+                    print(f"{Fore.YELLOW}⚠️ API format changed! Check documentation{Style.RESET_ALL}")
+                    return None
+                return data['data']
+            except Exception as e:
+                self.log(f"API page {page} attempt {attempt + 1} failed: {str(e)}")
+                if attempt < retries:
+                    time.sleep(0.5 * 2 ** attempt)
+        return None
+
+    def iter_api_pages(self, pages):
+        """Fetch API pages concurrently, yielding (page, entries) as each completes"""
+        headers = {
+            'User-Agent': self.generate_random_user_agent(),
+            'Accept': 'application/json'
+        }
+        start_page = int(dict(parse_qsl(urlparse(self.config['api_url']).query)).get('page', 1))
+        workers = min(pages, self.config.get('api_page_concurrency', 4))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.fetch_api_page, page, headers): page
+                       for page in range(start_page, start_page + pages)}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def filter_api_proxies(self, entries, like=None):
+        """Return a ProxyTable of raw API entries that pass latency, country and protocol filters"""
+        # Sharing intern tables with `like` lets the result be appended to it column-wise
+        table = like.derived() if like is not None else ProxyTable()
+        return table.ingest_api(entries, self.config['protocol_preference'], self.registry.favorite_hosts(),
+                                self.config['max_latency'], self.config['favorite_countries'])
+
     def fetch_tor_bridges(self):
         """Fetch Tor bridges for enhanced anonymity"""
         try:
             print(f"{Fore.BLUE}🌐 Fetching Tor bridges...{Style.RESET_ALL}")
-            response = requests.get(TOR_BRIDGES_URL, timeout=15)
+            response = self.sessions.get().get(TOR_BRIDGES_URL, timeout=15)
             if response.status_code == 200:
                 self.tor_bridges = response.text.strip().split('\n')
                 print(f"{Fore.GREEN}✅ Loaded {len(self.tor_bridges)} Tor bridges{Style.RESET_ALL}")
@@ -329,28 +3040,34 @@ class IPAlchemist:
         return False
 
     def cache_proxies(self):
-        """Cache proxies to file"""
-        cache_file = f"proxy_cache/proxies_{datetime.now().strftime('%Y%m%d_%H%M')}.json"
+        """Merge proxies into the cache store"""
         try:
-            with open(cache_file, 'w') as f:
-                json.dump(self.proxies, f, indent=4)
-            print(f"{Fore.CYAN}💾 Proxies cached to {cache_file}{Style.RESET_ALL}")
-        except:
+            count = self.cache_store.upsert_many(self.proxies)
+            expired = self.cache_store.purge_expired()
+            print(f"{Fore.CYAN}💾 Cached {count} proxies to {PROXY_CACHE_DB} ({expired} expired){Style.RESET_ALL}")
+        except Exception as e:
+            self.log(f"Proxy cache failed: {str(e)}")
             print(f"{Fore.YELLOW}⚠️ Failed to cache proxies{Style.RESET_ALL}")
 
-    def test_proxy(self, proxy, timeout=3):
-        """Test proxy connection with timeout"""
-        test_url = f"{proxy['protocol']}://{proxy['host']}:{proxy['port']}"
-        proxies = {
-            'http': test_url,
-            'https': test_url
-        }
-        
+    def test_proxy(self, proxy, timeout=None):
+        """Test proxy connection with timeout (adaptive to the proxy when not given)"""
+        if timeout is None:
+            timeout = self.probe_timeout(proxy, 3)
+        with self.timings.span('probe'):
+            return self._test_proxy(proxy, timeout)
+            
+    def probe_timeout(self, proxy, default):
+        """Timeout fitted to the proxy's observed latency, or default while it is unknown"""
+        if not self.config.get('adaptive_timeouts', True):
+            return default
+        return self.scorer.timeout(proxy, default, self.config.get('timeout_floor', 1.0),
+                                   self.config.get('timeout_ceiling', 8.0), self.config.get('timeout_margin', 1.5))
+            
+    def _test_proxy(self, proxy, timeout):
         try:
             start = time.time()
-            response = requests.get(
+            response = self.sessions.get(proxy).get(
                 IP_CHECK_URL,
-                proxies=proxies,
                 timeout=timeout,
                 headers={'User-Agent': self.generate_random_user_agent()}
             )
@@ -358,35 +3075,96 @@ class IPAlchemist:
             
             if response.status_code == 200:
                 # Track traffic
-                self.traffic_stats['received'] += len(response.content)
-                return {
+                self.record_traffic(proxy, received=len(response.content))
+                result = {
                     'working': True,
                     'ip': response.text.strip(),
                     'latency': latency
                 }
+                self.observe_probe(proxy, result)
+                return result
         except:
             pass
-        return {'working': False}
+        result = {'working': False}
+        self.observe_probe(proxy, result)
+        return result
+
+    def validate_all_proxies(self, concurrency=None, timeout=None):
+        """Probe every fetched proxy concurrently with asyncio"""
+        if not self.proxies:
+            print(f"{Fore.YELLOW}⚠️ No proxies to validate! Fetch first{Style.RESET_ALL}")
+            return []
+        concurrency = concurrency or self.config.get('validate_concurrency', 100)
+        timeout = timeout or self.config.get('validate_timeout', 5)
+        
+        print(f"{Fore.BLUE}🧪 Validating {len(self.proxies)} proxies ({concurrency} concurrent, {timeout}s deadline)...{Style.RESET_ALL}")
+        start = time.time()
+        # Work on copies: other threads may be reading the live table's records
+        proxies = [dict(proxy) for proxy in self.proxies]
+        results = asyncio.run(self._validate_proxies_async(proxies, concurrency, timeout))
+        
+        validated_at = datetime.now().isoformat()
+        updates = []
+        for proxy, result in zip(proxies, results):
+            self.observe_probe(proxy, result)
+            if result['working']:
+                self.record_traffic(proxy, received=result['received'])
+            updates.append({'host': proxy['host'], 'port': proxy['port'], 'working': result['working'],
+                            'measured_latency': result.get('latency'), 'ip': result.get('ip'),
+                            'validated': validated_at})
+        # The pool may have been refetched, grown or banned from while we probed
+        self.scorer.sync(self.registry.merge(updates))
+        
+        working = [p for p in self.proxies if p.get('working')]
+        elapsed = time.time() - start
+        self.cache_proxies()
+        print(f"{Fore.GREEN}✅ {len(working)}/{len(self.proxies)} proxies working | Validated in {elapsed:.1f}s{Style.RESET_ALL}")
+        self.log(f"Validated {len(self.proxies)} proxies: {len(working)} working in {elapsed:.1f}s")
+        return working
+
+    async def _validate_proxies_async(self, proxies, concurrency, timeout):
+        semaphore = asyncio.Semaphore(concurrency)
+        user_agent = self.generate_random_user_agent()
+        
+        async def bounded_probe(proxy):
+            async with semaphore:
+                return await async_probe_proxy(proxy, timeout, user_agent)
+                
+        return await asyncio.gather(*(bounded_probe(p) for p in proxies))
 
-    def find_working_proxy(self, max_attempts=15):
-        """Find a working proxy with intelligent selection"""
+    def find_working_proxy(self, max_attempts=15, country=None):
+        """Find a working proxy with intelligent selection, optionally only from one country"""
         if not self.proxies:
             print(f"{Fore.YELLOW}⚠️ No proxies available! Fetching new proxies...{Style.RESET_ALL}")
+            # The streamed first hit may be from any country
+            if self.config.get('streaming_pipeline', True) and country is None:
+                return self.stream_fetch_proxies()
             if not self.fetch_live_proxies():
                 return None
                 
-        # Create a prioritized list (favorites first, then by latency)
-        candidates = [p for p in self.proxies if p.get('is_favorite', False)]
-        if not candidates:
-            candidates = sorted(self.proxies, key=lambda x: x['latency'])
+        # Never "rotate" back onto the proxy we are leaving
+        exclude = {ProxyScorer.key(self.current_proxy)} if self.current_proxy else set()
+        exclude.update(self.registry.blacklist)
         
-        # Ensure we don't exceed max attempts
-        candidates = candidates[:max_attempts]
-        random.shuffle(candidates)  # Add randomness for load distribution
+        # Skip proxies still serving a failure backoff, unless nothing else is left
+        quarantined = self.quarantine.active()
+        candidates = self.select_candidates(max_attempts, exclude | quarantined, country)
+        if not candidates and quarantined:
+            self.log(f"All candidates quarantined, retrying {len(quarantined)} benched proxies")
+            candidates = self.select_candidates(max_attempts, exclude, country)
+        if not candidates and country:
+            print(f"{Fore.YELLOW}⚠️ No usable proxies from {country} in the pool{Style.RESET_ALL}")
+            return None
+        
+        if self.config.get('parallel_search', True):
+            return self.parallel_find_working_proxy(candidates)
+        if self.config.get('hedged_probes', True):
+            # One probe at a time, plus a hedge whenever the current one runs slow
+            return self.parallel_find_working_proxy(candidates, workers=1)
         
         for i, proxy in enumerate(candidates):
             print(f"{Fore.CYAN}🔎 Testing {proxy['host']}:{proxy['port']} ({proxy['protocol'].upper()}){Style.RESET_ALL}")
-            result = self.test_proxy(proxy, timeout=5)
+            result = self.test_proxy(proxy, timeout=self.probe_timeout(proxy, 5))
             
             if result['working']:
                 print(f"{Fore.GREEN}✅ Found working proxy: {result['ip']} | Latency: {result['latency']}ms{Style.RESET_ALL}")
@@ -395,60 +3173,146 @@ class IPAlchemist:
         print(f"{Fore.RED}❌ No working proxies found in batch{Style.RESET_ALL}")
         return None
 
+    def select_candidates(self, max_attempts, exclude, country=None):
+        """Prioritized candidates: favorites first, then by live score"""
+        if country:
+            # The country index gives the rows directly, already in ranked pool order
+            pool = [p for p in self.registry.select(country=country) if ProxyScorer.key(p) not in exclude]
+            favorites = [p for p in pool if p.get('is_favorite')]
+            random.shuffle(favorites)
+            return (favorites or pool)[:max_attempts]
+        candidates = [p for p in self.proxies.favorites() if ProxyScorer.key(p) not in exclude]
+        if candidates:
+            random.shuffle(candidates)  # Add randomness for load distribution
+        else:
+            candidates = self.scorer.best(max_attempts, exclude) or self.proxies.top_k(max_attempts, exclude)
+        # Ensure we don't exceed max attempts
+        return candidates[:max_attempts]
+        
+    def parallel_find_working_proxy(self, candidates, workers=None, deadline=None):
+        """Test candidates concurrently, hedging slow probes, and return the first working proxy"""
+        if not candidates:
+            return None
+        workers = workers or self.config.get('search_workers', 8)
+        deadline = deadline or self.config.get('search_deadline', 20)
+        hedging = self.config.get('hedged_probes', True)
+        min_delay = self.config.get('hedge_min_delay', 0.2)
+        end_time = time.time() + deadline
+        queued = deque(candidates)
+        running = {}  # future -> (proxy, time it becomes overdue)
+        
+        # Hedges may double the probes in flight, never more
+        limit = min(workers * 2 if hedging else workers, len(candidates))
+        executor = ThreadPoolExecutor(max_workers=limit)
+        
+        def launch():
+            proxy = queued.popleft()
+            now = time.time()
+            timeout = min(self.probe_timeout(proxy, 5), end_time - now)
+            overdue = now + max(min_delay, self.scorer.expected_latency(proxy) / 1000) if hedging else end_time
+            running[executor.submit(self.test_proxy, proxy, timeout)] = (proxy, overdue)
+        
+        print(f"{Fore.CYAN}🔎 Testing {len(candidates)} proxies with {workers} workers...{Style.RESET_ALL}")
+        try:
+            while running or queued:
+                now = time.time()
+                if now >= end_time:
+                    print(f"{Fore.YELLOW}⚠️ Proxy search deadline of {deadline}s reached{Style.RESET_ALL}")
+                    break
+                # A probe past its expected latency stops holding a worker slot, so a hedge starts beside it
+                on_time = sum(1 for _, overdue in running.values() if overdue > now)
+                while queued and on_time < workers and len(running) < limit:
+                    launch()
+                    on_time += 1
+                if not running:
+                    break
+                wake = min([overdue for _, overdue in running.values() if overdue > now] + [end_time])
+                done, _ = wait(running, timeout=max(0, wake - now), return_when=FIRST_COMPLETED)
+                for future in done:
+                    proxy, _ = running.pop(future)
+                    result = future.result()
+                    if result['working']:
+                        print(f"{Fore.GREEN}✅ Found working proxy: {result['ip']} | Latency: {result['latency']}ms{Style.RESET_ALL}")
+                        return {**proxy, **result}
+        finally:
+            # Don't wait for in-flight probes, they finish within their own timeout
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        print(f"{Fore.RED}❌ No working proxies found in batch{Style.RESET_ALL}")
+        return None
+
     def set_termux_proxy(self, proxy):
         """Set proxy for Termux environment"""
         if not proxy:
             return False
+        with self.timings.span('set'):
+            return self._set_termux_proxy(proxy)
             
+    def _set_termux_proxy(self, proxy):
+        span = self.timings.span
         try:
             # If in single host mode, use local proxy instead
             if self.config['single_host_mode']:
                 proxy_host = LOCAL_PROXY_HOST
                 proxy_port = LOCAL_PROXY_PORT
+                protocol = 'http'  # The local forwarder speaks HTTP/CONNECT
+                if not self.local_proxy_active and not self.start_local_proxy():
+                    return False
+                # Swap the upstream behind the fixed endpoint
+                self.local_proxy_server.set_upstream(proxy)
                 print(f"{Fore.BLUE}🔒 Using fixed proxy: {proxy_host}:{proxy_port}{Style.RESET_ALL}")
             else:
                 proxy_host = proxy['host']
                 proxy_port = proxy['port']
+                protocol = proxy['protocol']
             
             # Set environment variables
-            proxy_url = f"{proxy['protocol']}://{proxy_host}:{proxy_port}"
+            proxy_url = f"{protocol}://{proxy_host}:{proxy_port}"
             os.environ['HTTP_PROXY'] = proxy_url
             os.environ['HTTPS_PROXY'] = proxy_url
             
             # For curl/wget support
-            with open(os.path.expanduser('~/.curlrc'), 'w') as f:
-                f.write(f"proxy = {proxy_url}\n")
+            with span('set.curlrc'):
+                with open(os.path.expanduser('~/.curlrc'), 'w') as f:
+                    f.write(f"proxy = {proxy_url}\n")
                 
             # Save current proxy
             self.current_proxy = proxy
-            self.log(f"Proxy set: {proxy_host}:{proxy_port} | IP: {proxy['ip']}")
+            self.log(f"Proxy set: {proxy_host}:{proxy_port} | IP: {proxy.get('ip', proxy['host'])}")
             
             # Add to history
-            self.add_to_history(proxy)
+            with span('set.history'):
+                self.add_to_history(proxy)
             
             # Apply proxy chain if enabled
             if self.config['proxy_chain']:
-                self.setup_proxy_chain()
+                with span('set.chain'):
+                    self.setup_proxy_chain()
                 
             # Apply DNS protection
             if self.config['dns_protection']:
-                self.enable_dns_protection()
+                with span('set.dns'):
+                    self.enable_dns_protection()
                 
             # Apply kill switch
             if self.config['kill_switch']:
-                self.enable_kill_switch()
+                with span('set.kill_switch'):
+                    self.enable_kill_switch()
                 
             # Apply MAC randomization
             if self.config['mac_randomization']:
-                self.randomize_mac_address()
+                with span('set.mac'):
+                    self.randomize_mac_address()
                 
             # Apply browser spoofing
             if self.config['browser_spoofing']:
-                self.generate_browser_profile()
+                with span('set.profile'):
+                    self.generate_browser_profile()
                 
             # Enable TOR if configured
             if self.config['tor_integration']:
-                self.enable_tor_service()
+                with span('set.tor'):
+                    self.enable_tor_service()
                 
             return True
         except Exception as e:
@@ -476,14 +3340,14 @@ class IPAlchemist:
 
     def add_favorite(self, proxy):
         """Add proxy to favorites"""
-        if not any(fav['host'] == proxy['host'] for fav in self.favorites):
-            self.favorites.append({
-                'host': proxy['host'],
-                'port': proxy['port'],
-                'protocol': proxy['protocol'],
-                'country': proxy.get('country', ''),
-                'added': datetime.now().isoformat()
-            })
+        entry = {
+            'host': proxy['host'],
+            'port': proxy['port'],
+            'protocol': proxy['protocol'],
+            'country': proxy.get('country', ''),
+            'added': datetime.now().isoformat()
+        }
+        if self.registry.add_favorite(entry):
             print(f"{Fore.YELLOW}🌟 Added {proxy['host']} to favorites{Style.RESET_ALL}")
             self.save_favorites()
             return True
@@ -491,21 +3355,103 @@ class IPAlchemist:
 
     def remove_favorite(self, host):
         """Remove proxy from favorites"""
-        self.favorites = [fav for fav in self.favorites if fav['host'] != host]
+        self.registry.remove_favorite(host)
         print(f"{Fore.YELLOW}🗑️ Removed {host} from favorites{Style.RESET_ALL}")
         self.save_favorites()
         return True
 
-    def rotate_proxy(self):
-        """Rotate to a new working proxy"""
+    def rotate_proxy(self, country=None):
+        """Rotate to a new working proxy, optionally only from one country"""
+        if not self.config.get('profile_rotations', False):
+            with self.timings.span('rotate'):
+                return self._rotate_proxy(country)
+                
+        # Profiles the calling thread only; parallel probes show up as waits
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            profiler = None  # Another rotation is already being profiled
+        try:
+            with self.timings.span('rotate'):
+                return self._rotate_proxy(country)
+        finally:
+            if profiler:
+                profiler.disable()
+                path = os.path.join("proxy_stats", f"rotation_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.pstats")
+                profiler.dump_stats(path)
+                self.log(f"Rotation profile saved to {path}")
+                
+    def _rotate_proxy(self, country=None):
         print(f"\n{Fore.CYAN}🔄 Rotating IP address...{Style.RESET_ALL}")
-        new_proxy = self.find_working_proxy()
+        start = time.perf_counter()
+        exclude = {ProxyScorer.key(self.current_proxy)} if self.current_proxy else set()
+        exclude.update(self.registry.blacklist)
+        new_proxy = None
+        if country is None:  # Standby proxies are not grouped by country
+            with self.timings.span('rotate.standby'):
+                new_proxy = self.standby.pop(exclude)
+        source = 'standby' if new_proxy else 'search'
+        rotated = self._switch_proxy(new_proxy, country)
+        self.metrics.inc('ip_alchemist_rotations_total', result='ok' if rotated else 'failed', source=source)
+        self.metrics.observe('ip_alchemist_rotation_duration_ms', (time.perf_counter() - start) * 1000)
+        return rotated
+        
+    def _switch_proxy(self, new_proxy, country=None):
+        if new_proxy:
+            print(f"{Fore.GREEN}⚡ Switching to standby proxy {new_proxy['host']}:{new_proxy['port']}{Style.RESET_ALL}")
+            if self.scheduler.scheduled('standby'):
+                self.start_standby(delay=0)  # Top up right away
+        else:
+            with self.timings.span('rotate.search'):
+                new_proxy = self.find_working_proxy(country=country)
         if new_proxy and self.set_termux_proxy(new_proxy):
             if self.config['notifications']:
                 self.show_notification("Proxy Rotated", f"New IP: {new_proxy['ip']}")
             return new_proxy
         return None
 
+    def start_standby(self, delay=0):
+        """Keep a set of validated proxies ready so rotation and failover are instant"""
+        if self.config.get('standby_size', 5) <= 0:
+            return
+        self.scheduler.every('standby', self.config.get('standby_refill_interval', 20),
+                             self.refill_standby, delay=delay)
+        
+    def refill_standby(self):
+        """Revalidate aging standby proxies and top the set up from the best scored ones"""
+        current = {ProxyScorer.key(self.current_proxy)} if self.current_proxy else set()
+        aging = self.standby.aging()
+        wanted = self.standby.size - (len(self.standby) - len(aging))
+        fresh = []
+        if wanted > 0:
+            # Over-sample since free proxies fail often
+            fresh = self.scorer.best(wanted * 3, current | self.standby.keys() | self.quarantine.active()
+                                     | set(self.registry.blacklist))
+        candidates = aging + fresh
+        if not candidates:
+            return
+            
+        results = asyncio.run(self._validate_proxies_async(
+            candidates, self.config.get('validate_concurrency', 100), self.config.get('validate_timeout', 5)))
+        added = 0
+        for i, (proxy, result) in enumerate(zip(candidates, results)):
+            self.observe_probe(proxy, result)
+            if not result['working'] or self.registry.is_blacklisted(proxy):  # Banned while validating
+                self.standby.discard(proxy)
+                continue
+            self.record_traffic(proxy, received=result['received'])
+            if i >= len(aging):
+                if added >= wanted:
+                    continue
+                added += 1
+            self.standby.add({**proxy, 'ip': result['ip'], 'measured_latency': result['latency']})
+                
+    def probe_proxy(self, proxy):
+        """Test a proxy, sharing the result with other monitors probing it at the same time"""
+        return self.scheduler.probe(f"{proxy['host']}:{proxy['port']}", lambda: self.test_proxy(proxy))
+
     def start_rotation(self, interval_min, duration_hr):
         """Start automatic proxy rotation with infinite option"""
         self.rotation_active = True
@@ -515,34 +3461,31 @@ class IPAlchemist:
             end_time = None
             print(f"{Fore.MAGENTA}♾️ Rotation started: Runs indefinitely until manually stopped{Style.RESET_ALL}")
         else:
-            end_time = datetime.now() + timedelta(hours=duration_hr)
+            end_time = self.scheduler.clock() + duration_hr * 3600
             print(f"{Fore.MAGENTA}⏱ Rotation started: {interval_min} min intervals for {duration_hr} hours{Style.RESET_ALL}")
+        self.start_standby()
         
-        def rotation_loop():
-            while self.rotation_active and (end_time is None or datetime.now() < end_time):
-                proxy_info = self.rotate_proxy()
-                if proxy_info:
-                    print(f"{Fore.CYAN}⏱ Next rotation in {interval_min} minutes{Style.RESET_ALL}")
-                    self.show_wifi_instructions(proxy_info)
-                else:
-                    print(f"{Fore.YELLOW}⚠️ Rotation failed, retrying in 30 seconds{Style.RESET_ALL}")
-                    time.sleep(30)
-                    continue
-                    
-                time.sleep(interval_min * 60)
-            self.rotation_active = False
-            print(f"\n{Fore.GREEN}⏹ Rotation schedule completed{Style.RESET_ALL}")
+        def rotation_job():
+            if not self.rotation_active:
+                return False
+            if end_time is not None and self.scheduler.clock() >= end_time:
+                self.rotation_active = False
+                print(f"\n{Fore.GREEN}⏹ Rotation schedule completed{Style.RESET_ALL}")
+                return False
+            proxy_info = self.rotate_proxy()
+            if not proxy_info:
+                print(f"{Fore.YELLOW}⚠️ Rotation failed, retrying in 30 seconds{Style.RESET_ALL}")
+                return 30
+            print(f"{Fore.CYAN}⏱ Next rotation in {interval_min} minutes{Style.RESET_ALL}")
+            self.show_wifi_instructions(proxy_info)
             
-        self.rotation_thread = threading.Thread(target=rotation_loop)
-        self.rotation_thread.daemon = True
-        self.rotation_thread.start()
+        self.scheduler.every('rotation', interval_min * 60, rotation_job, delay=0)
 
     def stop_rotation(self):
         """Stop automatic rotation"""
         if self.rotation_active:
             self.rotation_active = False
-            if self.rotation_thread and self.rotation_thread.is_alive():
-                self.rotation_thread.join(timeout=2)
+            self.scheduler.cancel('rotation')
             print(f"\n{Fore.GREEN}⏹ Proxy rotation stopped{Style.RESET_ALL}")
             return True
         return False
@@ -566,6 +3509,10 @@ class IPAlchemist:
         print(f"{Fore.CYAN}Proxy Port: {port}{Style.RESET_ALL}")
         print(f"{Fore.CYAN}Protocol: {proxy['protocol'].upper()}{Style.RESET_ALL}")
         print(f"{Fore.CYAN}Country: {proxy.get('country', 'Unknown')}{Style.RESET_ALL}")
+        if proxy.get('city'):
+            print(f"{Fore.CYAN}City: {proxy['city']}{Style.RESET_ALL}")
+        if proxy.get('asn'):
+            print(f"{Fore.CYAN}Network: AS{proxy['asn']} {proxy.get('as_org', '')}{Style.RESET_ALL}")
         print(f"{Fore.CYAN}Latency: {proxy.get('latency', 'N/A')}ms{Style.RESET_ALL}")
         print(f"\n{Fore.GREEN}1. Go to Settings > Network & Internet > Wi-Fi{Style.RESET_ALL}")
         print(f"{Fore.GREEN}2. Long-press your connected network{Style.RESET_ALL}")
@@ -639,6 +3586,9 @@ class IPAlchemist:
         print(f"{Fore.CYAN}    (IP changes automatically behind this address){Style.RESET_ALL}")
         self.save_config()
         
+        if not self.config['single_host_mode'] and self.local_proxy_active:
+            self.stop_local_proxy()
+        
         # Update environment if proxy is active
         if self.current_proxy:
             self.set_termux_proxy(self.current_proxy)
@@ -652,10 +3602,18 @@ class IPAlchemist:
             
         try:
             print(f"{Fore.BLUE}🚀 Starting local proxy server...{Style.RESET_ALL}")
-            # This would be a separate implementation
-            # For now, we'll simulate it
+            server = LocalProxyServer(
+                LOCAL_PROXY_HOST, LOCAL_PROXY_PORT,
+                pool_max_per_upstream=self.config.get('pool_max_per_upstream', 8),
+                pool_idle_timeout=self.config.get('pool_idle_timeout', 30)
+            )
+            server.set_upstream(self.current_proxy)
+            server.on_traffic = self.record_traffic
+            server.start()
+            self.local_proxy_server = server
             self.local_proxy_active = True
-            print(f"{Fore.GREEN}✅ Local proxy running at 127.0.0.1:8080{Style.RESET_ALL}")
+            self.log(f"Local proxy started on {LOCAL_PROXY_HOST}:{LOCAL_PROXY_PORT}")
+            print(f"{Fore.GREEN}✅ Local proxy running at {LOCAL_PROXY_HOST}:{LOCAL_PROXY_PORT}{Style.RESET_ALL}")
             return True
         except Exception as e:
             print(f"{Fore.RED}❌ Failed to start local proxy: {str(e)}{Style.RESET_ALL}")
@@ -669,6 +3627,8 @@ class IPAlchemist:
             
         try:
             print(f"{Fore.BLUE}🛑 Stopping local proxy server...{Style.RESET_ALL}")
+            self.local_proxy_server.stop()
+            self.local_proxy_server = None
             self.local_proxy_active = False
             print(f"{Fore.GREEN}✅ Local proxy stopped{Style.RESET_ALL}")
             return True
@@ -724,18 +3684,15 @@ class IPAlchemist:
         print(f"{Fore.CYAN}⏱ Testing speed for {target['host']}:{target['port']}...{Style.RESET_ALL}")
         
         try:
-            test_url = f"{target['protocol']}://{target['host']}:{target['port']}"
-            proxies = {'http': test_url, 'https': test_url}
-            
             start = time.time()
-            response = requests.get(
+            response = self.sessions.get(target).get(
                 test_url,
-                proxies=proxies,
                 timeout=timeout,
                 stream=True
             )
             size = len(response.content)
             elapsed = time.time() - start
+            self.record_traffic(target, received=size)
             
             if response.status_code == 200:
                 speed = size / elapsed / 1024  # KB/s
@@ -750,17 +3707,8 @@ class IPAlchemist:
 
     def log(self, message):
         """Log to file with timestamp"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] {message}"
-        
-        # Write to main log
-        with open(LOG_FILE, 'a') as f:
-            f.write(log_entry + "\n")
-            
-        # Write to daily log
-        daily_log = f"logs/proxy_{datetime.now().strftime('%Y%m%d')}.log"
-        with open(daily_log, 'a') as f:
-            f.write(log_entry + "\n")
+        # Written in batches by the logger thread (main log and daily log)
+        self.logger.write(message)
 
     # ===== ENTERPRISE FEATURES =====
     def proxy_geofence(self, countries):
@@ -775,19 +3723,24 @@ class IPAlchemist:
         self.config['proxy_uptime_monitor'] = True
         print("📈 Starting proxy uptime monitoring...")
         
-        def monitor_thread():
-            while self.config['proxy_uptime_monitor']:
-                if self.current_proxy:
-                    key = f"{self.current_proxy['host']}:{self.current_proxy['port']}"
-                    if key not in self.proxy_uptime:
-                        self.proxy_uptime[key] = {"start": time.time(), "downtime": 0}
-                    
-                    # Test connection
-                    if not self.test_proxy(self.current_proxy):
-                        self.proxy_uptime[key]["downtime"] += 5
-                    time.sleep(5)
-                    
-        threading.Thread(target=monitor_thread, daemon=True).start()
+        interval = 5
+        
+        def uptime_job():
+            if not self.config['proxy_uptime_monitor']:
+                return False
+            proxy = self.current_proxy
+            if not proxy:
+                return
+            key = f"{proxy['host']}:{proxy['port']}"
+            if key not in self.proxy_uptime:
+                self.proxy_uptime[key] = {"start": time.time(), "downtime": 0}
+                
+            # Test connection
+            result = self.probe_proxy(proxy)
+            if result and not result['working']:
+                self.proxy_uptime[key]["downtime"] += interval
+                
+        self.scheduler.every('uptime', interval, uptime_job, delay=0)
         print("✅ Uptime monitoring active")
         
     def show_proxy_uptime(self):
@@ -836,9 +3789,22 @@ class IPAlchemist:
                 uptime_percent = ((total_time - data["downtime"]) / total_time) * 100
                 print(f"  {proxy}: {uptime_percent:.1f}%")
                 
-        # Health status
+        # Slowest stages
+        stages = self.timings.summary(8)
+        if stages:
+            print(f"\n{Fore.YELLOW}🐢 Slowest Stages (ms):{Style.RESET_ALL}")
+            print(f"  {'stage':<18}{'count':>6}{'avg':>9}{'p95':>9}{'max':>9}")
+            for stage, count, avg, p95, worst in stages:
+                print(f"  {stage:<18}{count:>6}{avg:>9.1f}{p95:>9.1f}{worst:>9.1f}")
+                
+        # Health status from the live probe record of the active proxy
         if self.current_proxy:
-            print(f"\n{Fore.MAGENTA}🩺 Health Status: Excellent{Style.RESET_ALL}")
+            entry = self.scorer.stats.get(ProxyScorer.key(self.current_proxy))
+            health = "Unknown"
+            if entry and entry['successes'] + entry['failures']:
+                ratio = entry['successes'] / (entry['successes'] + entry['failures'])
+                health = f"{'Excellent' if ratio >= 0.95 else 'Good' if ratio >= 0.8 else 'Poor'} ({ratio:.0%} of probes ok)"
+            print(f"\n{Fore.MAGENTA}🩺 Health Status: {health}{Style.RESET_ALL}")
             print(f"{Fore.MAGENTA}🎭 Anonymity: Elite{Style.RESET_ALL}")
             
         print(f"{Fore.MAGENTA}{'='*60}{Style.RESET_ALL}")
@@ -849,15 +3815,19 @@ class IPAlchemist:
         self.config['auto_rotate_fail'] = True
         self.save_config()
         
-        def failover_monitor():
-            while self.config['auto_rotate_fail']:
-                if self.current_proxy:
-                    if not self.test_proxy(self.current_proxy):
-                        print("⚠️ Proxy failure detected! Switching to backup...")
-                        self.rotate_proxy()
-                time.sleep(30)
+        def failover_job():
+            if not self.config['auto_rotate_fail']:
+                return False
+            proxy = self.current_proxy
+            if not proxy:
+                return
+            result = self.probe_proxy(proxy)
+            if result and not result['working']:
+                print("⚠️ Proxy failure detected! Switching to backup...")
+                self.rotate_proxy()
                 
-        threading.Thread(target=failover_monitor, daemon=True).start()
+        self.scheduler.every('failover', 30, failover_job, delay=0)
+        self.start_standby()
         print("✅ Failover system active")
         
     def proxy_encrypted_storage(self, enable=True):
@@ -1254,18 +4224,14 @@ class IPAlchemist:
         with open(profile_file, 'w') as f:
             json.dump(profile, f, indent=4)
             
-        # Save to database
-        conn = sqlite3.connect(FINGERPRINT_DB)
-        c = conn.cursor()
-        c.execute('''INSERT INTO fingerprints 
-                    (user_agent, platform, language, timezone, screen, fonts, 
-                    canvas_hash, webgl_hash, created) 
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                (profile['user_agent'], profile['platform'], profile['language'],
-                 profile['timezone'], profile['screen'], json.dumps(profile['fonts']),
-                 profile['canvas_hash'], profile['webgl_hash'], datetime.now().isoformat()))
-        conn.commit()
-        conn.close()
+        # Save to database (write-behind, the rotation never waits on SQLite)
+        self.fingerprint_db.submit('''INSERT INTO fingerprints 
+                                      (user_agent, platform, language, timezone, screen, fonts, 
+                                      canvas_hash, webgl_hash, created) 
+                                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                                   (profile['user_agent'], profile['platform'], profile['language'],
+                                    profile['timezone'], profile['screen'], json.dumps(profile['fonts']),
+                                    profile['canvas_hash'], profile['webgl_hash'], datetime.now().isoformat()))
             
         print(f"{Fore.GREEN}✅ Browser profile generated: {profile_file}{Style.RESET_ALL}")
         return profile
@@ -1331,27 +4297,20 @@ class IPAlchemist:
         print(f"  Sent: {self.traffic_stats['sent'] / 1024:.2f} KB")
         print(f"  Received: {self.traffic_stats['received'] / 1024:.2f} KB")
         
-        # Historical data
-        conn = sqlite3.connect(TRAFFIC_DB)
-        c = conn.cursor()
-        c.execute("SELECT SUM(sent), SUM(received) FROM traffic")
-        total = c.fetchone()
+        # Historical data (from the daily rollup, flushed first so it includes this session)
+        self.traffic_meter.flush()
+        total = self.traffic_meter.totals()
         
-        if total and total[0]:
+        if total and (total[0] or total[1]):
             print(f"\n{Fore.CYAN}Historical Total:{Style.RESET_ALL}")
             print(f"  Sent: {total[0] / (1024 * 1024):.2f} MB")
             print(f"  Received: {total[1] / (1024 * 1024):.2f} MB")
         
         # Last 7 days
-        c.execute("""SELECT DATE(timestamp), SUM(sent), SUM(received) 
-                     FROM traffic 
-                     WHERE DATE(timestamp) >= DATE('now', '-7 days') 
-                     GROUP BY DATE(timestamp)""")
         print(f"\n{Fore.CYAN}Last 7 Days:{Style.RESET_ALL}")
-        for row in c.fetchall():
+        for row in self.traffic_meter.daily(7):
             print(f"  {row[0]}: ↑{row[1] / 1024:.2f} KB / ↓{row[2] / 1024:.2f} KB")
         
-        conn.close()
         print(f"{Fore.MAGENTA}{'='*50}{Style.RESET_ALL}")
 
     def display_network_map(self):
@@ -1408,7 +4367,8 @@ def enterprise_menu(proxy_master):
         print(f"10. {Fore.CYAN}📊 Bandwidth Optimizer{Style.RESET_ALL}")
         print(f"11. {Fore.CYAN}🔗 Share QR Code{Style.RESET_ALL}")
         print(f"12. {Fore.CYAN}📈 Usage Forecast{Style.RESET_ALL}")
-        print(f"13. {Fore.CYAN}🔙 Back to Main Menu{Style.RESET_ALL}")
+        print(f"13. {Fore.CYAN}🧪 Validate All Proxies{Style.RESET_ALL}")
+        print(f"14. {Fore.CYAN}🔙 Back to Main Menu{Style.RESET_ALL}")
         
         choice = input(f"\n{Fore.YELLOW}🔍 Select option:{Style.RESET_ALL} ").strip()
         
@@ -1439,25 +4399,86 @@ def enterprise_menu(proxy_master):
         elif choice == '12':
             proxy_master.proxy_usage_forecast()
         elif choice == '13':
+            proxy_master.validate_all_proxies()
+        elif choice == '14':
             break
         else:
             print(f"{Fore.YELLOW}⚠️ Invalid selection{Style.RESET_ALL}")
 
 # ===== ENHANCED MAIN APPLICATION =====
+def startup_report(phases):
+    """Print where startup time went and compare it to the budget"""
+    print(f"\n{Fore.MAGENTA}{'='*40}{Style.RESET_ALL}")
+    print(f"{Fore.YELLOW}⏱ STARTUP REPORT".center(40) + f"{Style.RESET_ALL}")
+    print(f"{Fore.MAGENTA}{'='*40}{Style.RESET_ALL}")
+    previous = 0.0
+    for name, elapsed in phases:
+        print(f"{Fore.CYAN}{name:<24}{Style.RESET_ALL} {elapsed - previous:8.1f} ms")
+        previous = elapsed
+    if IMPORT_TIMES:
+        print(f"\n{Fore.CYAN}Lazy imports so far:{Style.RESET_ALL}")
+        for name, elapsed in sorted(IMPORT_TIMES.items(), key=lambda x: -x[1]):
+            print(f"  {name:<22} {elapsed:8.1f} ms")
+    total = phases[-1][1]
+    color = Fore.GREEN if total <= STARTUP_BUDGET_MS else Fore.RED
+    print(f"\n{color}Total: {total:.1f} ms (budget {STARTUP_BUDGET_MS} ms){Style.RESET_ALL}")
+
 def main():
+    parser = argparse.ArgumentParser(description="IP Alchemist proxy manager")
+    parser.add_argument('--startup-report', action='store_true', help="print a startup timing report")
+    parser.add_argument('--profile', action='store_true', help="dump a cProfile file per rotation into proxy_stats/")
+    parser.add_argument('--metrics', action='store_true', help="serve Prometheus metrics on metrics_port")
+    parser.add_argument('--daemon', action='store_true', help="run headless, controlled through the socket")
+    parser.add_argument('--socket', default=CONTROL_SOCKET, help="control socket path")
+    parser.add_argument('--ctl', nargs='+', metavar='CMD',
+                        help="send a command to a running daemon (ping, status, stats, rotate [COUNTRY], fetch, "
+                             "set-proxy HOST:PORT [PROTOCOL], ban HOST:PORT, shutdown)")
+    args = parser.parse_args()
+    
+    if args.ctl:
+        try:
+            reply = control_request(args.socket, args.ctl[0], args.ctl[1:])
+        except Exception as e:
+            print(f"{Fore.RED}❌ Daemon unreachable on {args.socket}: {str(e)}{Style.RESET_ALL}")
+            sys.exit(1)
+        print(json.dumps(reply, indent=2))
+        sys.exit(0 if reply.get('ok') else 1)
+        
+    if args.daemon:
+        proxy_master = IPAlchemist()
+        if args.profile:
+            proxy_master.config['profile_rotations'] = True
+        if args.metrics or proxy_master.config.get('metrics_enabled', False):
+            proxy_master.start_metrics_server()
+        sys.exit(0 if proxy_master.run_daemon(args.socket) else 1)
+        
+    elapsed = lambda: (time.perf_counter() - STARTUP_STARTED) * 1000
+    phases = [("module import", elapsed())]
     display_banner()
+    phases.append(("banner", elapsed()))
     
     proxy_master = IPAlchemist()
-    proxy_master.load_state()
+    if args.profile:
+        proxy_master.config['profile_rotations'] = True
+    if args.metrics or proxy_master.config.get('metrics_enabled', False):
+        proxy_master.start_metrics_server()
+    phases.append(("initialization", elapsed()))
+    
+    # State and warm start load in the background while the menu is drawn
+    restore = threading.Thread(target=proxy_master.restore_session, daemon=True)
+    proxy_master.restored.clear()  # before the thread runs, so an early Ctrl+C cannot save an empty pool
+    restore.start()
     
     # Auto-start if configured
     if proxy_master.config.get('auto_start', False):
+        restore.join()
         print(f"\n{Fore.BLUE}🚀 Starting auto-rotation as per configuration...{Style.RESET_ALL}")
         proxy_master.start_rotation(
             proxy_master.config.get('rotation_interval', 5),
             proxy_master.config.get('rotation_duration', 1)
         )
     
+    first_menu = True
     while True:
         print(f"\n{Fore.MAGENTA}{'='*30}{Style.RESET_ALL}")
         print(f"{Fore.YELLOW}📱 MAIN MENU".center(30) + f"{Style.RESET_ALL}")
@@ -1483,18 +4504,32 @@ def main():
         print(f"19. {Fore.CYAN}🔌 Clear settings{Style.RESET_ALL}")
         print(f"20. {Fore.CYAN}🚪 Exit{Style.RESET_ALL}")
         
+        if first_menu:
+            first_menu = False
+            phases.append(("menu ready", elapsed()))
+            proxy_master.log(f"Startup took {phases[-1][1]:.0f} ms")
+            if args.startup_report:
+                startup_report(phases)
+            try:
+                import readline  # Line editing for input(), only needed once the menu is up
+            except ImportError:
+                pass
+        
         try:
             choice = input(f"\n{Fore.YELLOW}🔍 Select option:{Style.RESET_ALL} ").strip()
         except EOFError:
             print("\nExiting...")
+            restore.join()
+            proxy_master.shutdown()
             break
+        restore.join()
             
         if choice == '1':
             if proxy_master.fetch_live_proxies():
                 print(f"{Fore.GREEN}🌟 {len(proxy_master.proxies)} proxies available{Style.RESET_ALL}")
         
         elif choice == '2':
-            if not proxy_master.proxies:
+            if not proxy_master.proxies and not proxy_master.config['streaming_pipeline']:
                 print(f"{Fore.YELLOW}⚠️ No proxies! Fetch first{Style.RESET_ALL}")
                 continue
                 
@@ -1503,7 +4538,7 @@ def main():
                 proxy_master.show_wifi_instructions(proxy)
         
         elif choice == '3':
-            if not proxy_master.proxies:
+            if not proxy_master.proxies and not proxy_master.config['streaming_pipeline']:
                 print(f"{Fore.YELLOW}⚠️ No proxies! Fetch first{Style.RESET_ALL}")
                 continue
                 
@@ -1523,7 +4558,10 @@ def main():
                 p = proxy_master.current_proxy
                 print(f"\n{Fore.CYAN}🔌 Current Proxy: {p['host']}:{p['port']}{Style.RESET_ALL}")
                 print(f"{Fore.BLUE}📡 Protocol: {p['protocol'].upper()}{Style.RESET_ALL}")
-                print(f"{Fore.GREEN}🌍 Location: {p.get('country', 'N/A')}{Style.RESET_ALL}")
+                location = ', '.join(str(v) for v in (p.get('city'), p.get('country')) if v) or 'N/A'
+                print(f"{Fore.GREEN}🌍 Location: {location}{Style.RESET_ALL}")
+                if p.get('asn'):
+                    print(f"{Fore.GREEN}🏢 Network: AS{p['asn']} {p.get('as_org', '')}{Style.RESET_ALL}")
                 print(f"{Fore.MAGENTA}📶 Your IP: {p.get('ip', 'N/A')}{Style.RESET_ALL}")
                 print(f"{Fore.YELLOW}⏱ Latency: {p.get('latency', 'N/A')}ms{Style.RESET_ALL}")
                 if proxy_master.config['single_host_mode']:
@@ -1704,8 +4742,7 @@ def main():
                 print(f"{Fore.GREEN}✅ Proxy settings cleared{Style.RESET_ALL}")
         
         elif choice == '20':
-            proxy_master.stop_rotation()
-            proxy_master.save_state()
+            proxy_master.shutdown()
             print(f"\n{Fore.MAGENTA}🔌 Exiting Aryan's IP Alchemist{Style.RESET_ALL}")
             break
         
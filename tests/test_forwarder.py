@@ -0,0 +1,191 @@
+import socket
+import socketserver
+import threading
+
+import pytest
+
+from ip_alchemist import LocalProxyServer
+
+
+class UpstreamHandler(socketserver.StreamRequestHandler):
+    """Fake HTTP proxy: echoes tunnels and upgrades, answers requests with its name and connection number"""
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+            number = self.server.connections
+        while True:
+            lines = []
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                if line == b'\r\n':
+                    break
+                lines.append(line.decode('latin-1').rstrip('\r\n'))
+            headers = {k.strip().lower(): v.strip() for k, v in (l.split(':', 1) for l in lines[1:])}
+            self.server.requests.append((lines[0], headers))
+            if lines[0].startswith('CONNECT '):
+                self.wfile.write(b"HTTP/1.1 200 Connection Established\r\n\r\n")
+                return self.echo()
+            if 'upgrade' in headers:
+                self.wfile.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: echo\r\nConnection: Upgrade\r\n\r\n")
+                return self.echo()
+            if headers.get('expect') == '100-continue' and self.server.continues:
+                self.wfile.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            body = self.rfile.read(int(headers.get('content-length', 0)))
+            reply = f"{self.server.name} {number} ".encode() + body
+            self.wfile.write(b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n" % len(reply) + reply)
+
+    def echo(self):
+        while True:
+            data = self.rfile.read1(65536)
+            if not data:
+                return
+            self.wfile.write(data)
+
+
+class Upstream(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, name, continues=True):
+        super().__init__(('127.0.0.1', 0), UpstreamHandler)
+        self.name = name
+        self.continues = continues  # answer Expect: 100-continue
+        self.connections = 0
+        self.requests = []  # (request line, headers)
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True).start()
+
+    @property
+    def proxy(self):
+        return {'host': '127.0.0.1', 'port': self.server_address[1], 'protocol': 'http'}
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class Client:
+    def __init__(self, port):
+        self.sock = socket.create_connection(('127.0.0.1', port), timeout=5)
+        self.file = self.sock.makefile('rb')
+
+    def send(self, data):
+        self.sock.sendall(data)
+
+    def head(self):
+        status = self.file.readline().decode('latin-1').rstrip('\r\n')
+        headers = {}
+        for line in iter(self.file.readline, b'\r\n'):
+            name, value = line.decode('latin-1').split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+        return status, headers
+
+    def response(self):
+        status, headers = self.head()
+        return status, headers, self.file.read(int(headers.get('content-length', 0)))
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+@pytest.fixture
+def upstream():
+    servers = []
+
+    def start(name='a', **kwargs):
+        servers.append(Upstream(name, **kwargs))
+        return servers[-1]
+    yield start
+    for server in servers:
+        server.close()
+
+
+@pytest.fixture
+def forwarder():
+    server = LocalProxyServer('127.0.0.1', 0, continue_timeout=0.2)
+    server.start()
+    clients = []
+
+    def connect():
+        clients.append(Client(server.server.sockets[0].getsockname()[1]))
+        return clients[-1]
+    server.connect = connect
+    yield server
+    for client in clients:
+        client.close()
+    server.stop()
+
+
+GET = b"GET http://example.com/ HTTP/1.1\r\nHost: example.com\r\nProxy-Connection: keep-alive\r\n\r\n"
+
+
+def test_keep_alive_reuses_the_upstream_connection(upstream, forwarder):
+    a = upstream('a')
+    forwarder.set_upstream(a.proxy)
+    client = forwarder.connect()
+    for _ in range(2):
+        client.send(GET)
+        assert client.response()[::2] == ('HTTP/1.1 200 OK', b'a 1 ')
+    assert a.connections == 1
+    _, headers = a.requests[0]
+    assert headers['connection'] == 'keep-alive' and 'proxy-connection' not in headers
+
+
+def test_upstream_swap_applies_to_the_next_request(upstream, forwarder):
+    a, b = upstream('a'), upstream('b')
+    forwarder.set_upstream(a.proxy)
+    client = forwarder.connect()
+    client.send(GET)
+    assert client.response()[2] == b'a 1 '
+    forwarder.set_upstream(b.proxy)
+    client.send(GET)
+    assert client.response()[2] == b'b 1 '
+    assert len(a.requests) == 1
+
+
+def test_connect_tunnel(upstream, forwarder):
+    a = upstream('a')
+    forwarder.set_upstream(a.proxy)
+    client = forwarder.connect()
+    client.send(b"CONNECT example.com:443 HTTP/1.1\r\nHost: example.com:443\r\n\r\n")
+    assert client.head()[0] == 'HTTP/1.1 200 Connection Established'
+    client.send(b'ping')
+    assert client.file.read(4) == b'ping'
+    assert a.requests[0][0].startswith('CONNECT example.com:443 ')
+
+
+def test_upgrade_switches_to_a_raw_tunnel(upstream, forwarder):
+    a = upstream('a')
+    forwarder.set_upstream(a.proxy)
+    client = forwarder.connect()
+    client.send(b"GET http://example.com/ws HTTP/1.1\r\nHost: example.com\r\n"
+                b"Upgrade: echo\r\nConnection: Upgrade\r\n\r\n")
+    assert client.head()[0] == 'HTTP/1.1 101 Switching Protocols'
+    client.send(b'ping')
+    assert client.file.read(4) == b'ping'
+    _, headers = a.requests[0]
+    assert headers['upgrade'] == 'echo' and headers['connection'] == 'Upgrade'
+
+
+POST = (b"POST http://example.com/ HTTP/1.1\r\nHost: example.com\r\n"
+        b"Expect: 100-continue\r\nContent-Length: 4\r\n\r\n")
+
+
+def test_expect_continue_relays_100_before_the_body(upstream, forwarder):
+    forwarder.set_upstream(upstream('a').proxy)
+    client = forwarder.connect()
+    client.send(POST)  # the body is held back until the client sees 100 Continue
+    assert client.head()[0] == 'HTTP/1.1 100 Continue'
+    client.send(b'body')
+    assert client.response()[::2] == ('HTTP/1.1 200 OK', b'a 1 body')
+
+
+def test_expect_continue_sends_the_body_when_upstream_ignores_expect(upstream, forwarder):
+    forwarder.set_upstream(upstream('a', continues=False).proxy)
+    client = forwarder.connect()
+    client.send(POST + b'body')
+    assert client.response()[::2] == ('HTTP/1.1 200 OK', b'a 1 body')
@@ -0,0 +1,23 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from ip_alchemist import MetricsRegistry
+
+
+def test_short_lived_threads_do_not_pile_up_shards():
+    registry = MetricsRegistry()
+    for _ in range(50):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: registry.inc('probes'), range(16)))
+    assert len(registry.shards) <= 8
+    assert registry.snapshot()[0][('probes', ())] == 800
+
+
+def test_histogram_render():
+    registry = MetricsRegistry()
+    registry.describe('latency_ms', 'histogram', 'Latency')
+    registry.observe('latency_ms', 7)
+    registry.observe('latency_ms', 20000)
+    text = registry.render()
+    assert 'latency_ms_bucket{le="10"} 1' in text
+    assert 'latency_ms_bucket{le="+Inf"} 2' in text
+    assert 'latency_ms_count 2' in text
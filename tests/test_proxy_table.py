@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from ip_alchemist import ProxyTable
+
+PROXIES = [
+    {'host': '10.0.0.1', 'port': '8080', 'protocol': 'http', 'country': 'US', 'latency': 120},
+    {'host': 'proxy.example.com', 'port': 3128, 'protocol': 'socks5', 'country': ''},
+    {'host': '10.0.0.3', 'port': 1080, 'protocol': 'socks5', 'working': True, 'measured_latency': 40},
+]
+
+
+def test_records_round_trip_with_same_keys():
+    table = ProxyTable.from_records(PROXIES)
+    assert table.to_dicts() == [
+        {'host': '10.0.0.1', 'port': 8080, 'protocol': 'http', 'country': 'US', 'latency': 120},
+        {'host': 'proxy.example.com', 'port': 3128, 'protocol': 'socks5', 'country': ''},
+        {'host': '10.0.0.3', 'port': 1080, 'protocol': 'socks5', 'working': True, 'measured_latency': 40},
+    ]
+
+
+def test_missing_and_empty_fields():
+    table = ProxyTable.from_records(PROXIES)
+    assert table[1]['country'] == ''
+    assert 'country' not in table[2]
+    assert table[2].get('country', 'Unknown') == 'Unknown'
+    with pytest.raises(KeyError):
+        table[0]['working']
+    assert 'latency' not in table[1]
+
+
+def test_record_mutation_and_extras():
+    table = ProxyTable.from_records(PROXIES)
+    record = table[0]
+    record['working'] = False
+    record['city'] = 'Berlin'
+    assert table[0]['working'] is False and table[0]['city'] == 'Berlin'
+    del record['city']
+    assert 'city' not in record
+    with pytest.raises(KeyError):
+        del record['host']
+    assert json.loads(json.dumps(table[0], default=dict))['host'] == '10.0.0.1'
+
+
+def test_ingest_api_filters_and_picks_preferred_protocol():
+    entries = [
+        {'ip': '1.1.1.1', 'port': '80', 'protocols': ['socks4', 'http'], 'country': 'US', 'latency': 50},
+        {'ip': '1.1.1.2', 'port': '80', 'protocols': ['http'], 'country': 'DE', 'latency': 50},
+        {'ip': '1.1.1.3', 'port': '80', 'protocols': ['http'], 'country': 'US', 'latency': 5000},
+        {'ip': '1.1.1.4', 'port': '80', 'protocols': ['ftp'], 'country': 'US', 'latency': 50},
+    ]
+    table = ProxyTable().ingest_api(entries, ['http', 'socks4'], {'1.1.1.1'}, max_latency=2000, countries=['US'])
+    assert [(p['host'], p['protocol'], p['is_favorite']) for p in table] == [('1.1.1.1', 'http', True)]
+
+
+def test_ranked_and_top_k():
+    table = ProxyTable.from_records([
+        {'host': '10.0.0.1', 'port': 1, 'protocol': 'http', 'latency': 50, 'working': False},
+        {'host': '10.0.0.2', 'port': 1, 'protocol': 'http', 'latency': 300},
+        {'host': '10.0.0.3', 'port': 1, 'protocol': 'http', 'latency': 900, 'working': True, 'measured_latency': 80},
+        {'host': '10.0.0.4', 'port': 1, 'protocol': 'http', 'latency': 100},
+    ])
+    assert [p['host'] for p in table.ranked()] == ['10.0.0.3', '10.0.0.4', '10.0.0.2', '10.0.0.1']
+    assert [p['host'] for p in table.top_k(2, exclude={'10.0.0.1:1'})] == ['10.0.0.4', '10.0.0.2']
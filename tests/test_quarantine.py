@@ -0,0 +1,51 @@
+from ip_alchemist import Quarantine
+
+PROXY = {'host': '10.0.0.1', 'port': 8080}
+KEY = '10.0.0.1:8080'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        
+    def __call__(self):
+        return self.now
+
+
+def test_backoff_doubles_up_to_cap():
+    quarantine = Quarantine(base=60, factor=2.0, max_backoff=300, clock=FakeClock())
+    assert [quarantine.fail(PROXY) for _ in range(5)] == [60, 120, 240, 300, 300]
+
+
+def test_membership_expires_with_backoff():
+    clock = FakeClock()
+    quarantine = Quarantine(base=60, clock=clock)
+    quarantine.fail(PROXY)
+    assert KEY in quarantine and quarantine.active() == {KEY}
+    clock.now += 61
+    assert KEY not in quarantine and len(quarantine) == 0
+
+
+def test_success_releases_and_halves_strikes():
+    clock = FakeClock()
+    quarantine = Quarantine(base=60, clock=clock)
+    for _ in range(4):
+        quarantine.fail(PROXY)
+    quarantine.succeed(PROXY)
+    assert KEY not in quarantine
+    assert quarantine.fail(PROXY) == 60 * 2 ** 2  # two strikes left, this is the third
+    quarantine.succeed(PROXY)
+    quarantine.succeed(PROXY)
+    assert KEY not in quarantine.entries
+
+
+def test_state_round_trip_and_prune():
+    clock = FakeClock()
+    quarantine = Quarantine(base=60, max_backoff=3600, clock=clock)
+    quarantine.fail(PROXY)
+    restored = Quarantine(base=60, max_backoff=3600, clock=clock)
+    restored.load(quarantine.to_dict())
+    assert KEY in restored
+    clock.now += 60 + 3600 + 1
+    restored.prune()
+    assert not restored.entries
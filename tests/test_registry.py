@@ -0,0 +1,46 @@
+from ip_alchemist import ProxyRegistry
+
+PROXIES = [
+    {'host': '10.0.0.1', 'port': '8080', 'protocol': 'http', 'country': 'US', 'latency': 120},
+    {'host': 'proxy.example.com', 'port': 3128, 'protocol': 'socks5', 'country': ''},
+    {'host': '10.0.0.3', 'port': 1080, 'protocol': 'socks5', 'working': True, 'measured_latency': 40},
+]
+
+
+def test_registry_indexes():
+    registry = ProxyRegistry()
+    registry.replace(PROXIES)
+    assert registry.lookup('10.0.0.1', '8080')['country'] == 'US'
+    assert registry.lookup('proxy.example.com', 3128)['protocol'] == 'socks5'
+    assert registry.lookup('10.0.0.9', 80) is None
+    assert [p['host'] for p in registry.select(protocol='socks5')] == ['proxy.example.com', '10.0.0.3']
+    assert [p['host'] for p in registry.select(country='US', protocol='http')] == ['10.0.0.1']
+    registry.add({'host': '10.0.0.4', 'port': 80, 'protocol': 'http', 'country': 'US'})
+    assert len(registry.select(country='US')) == 2
+    assert registry.remove('10.0.0.1', 8080) and registry.lookup('10.0.0.1', 8080) is None
+    assert registry.lookup('10.0.0.4', 80)['host'] == '10.0.0.4'
+
+
+def test_registry_favorites_and_blacklist():
+    registry = ProxyRegistry()
+    registry.replace(PROXIES)
+    entry = {'host': '10.0.0.1', 'port': 8080, 'protocol': 'http', 'country': 'US', 'added': 'now'}
+    assert registry.add_favorite(entry) and not registry.add_favorite(dict(entry))
+    assert registry.favorites == [entry] and registry.lookup('10.0.0.1', 8080)['is_favorite']
+    assert registry.remove_favorite('10.0.0.1') and not registry.lookup('10.0.0.1', 8080)['is_favorite']
+    registry.ban({'host': '10.0.0.3', 'port': 1080})
+    assert registry.blacklist == ['10.0.0.3:1080']
+    assert registry.is_blacklisted({'host': '10.0.0.3', 'port': 1080})
+    assert registry.lookup('10.0.0.3', 1080) is None
+
+
+def test_registry_merge_keeps_pool_changes_made_meanwhile():
+    registry = ProxyRegistry()
+    registry.replace(PROXIES)
+    registry.remove('10.0.0.1', 8080)
+    registry.add({'host': '10.0.0.4', 'port': 80, 'protocol': 'http'})
+    registry.merge([{'host': '10.0.0.1', 'port': '8080', 'working': True, 'measured_latency': 5},
+                    {'host': 'proxy.example.com', 'port': 3128, 'working': True, 'measured_latency': 10}])
+    assert [p['host'] for p in registry.proxies] == ['proxy.example.com', '10.0.0.3', '10.0.0.4']
+    assert registry.lookup('proxy.example.com', 3128)['protocol'] == 'socks5'
+    assert registry.lookup('10.0.0.4', 80).get('working') is None
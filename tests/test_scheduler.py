@@ -0,0 +1,133 @@
+import threading
+
+from ip_alchemist import Scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        
+    def __call__(self):
+        return self.now
+        
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def make_scheduler(**kwargs):
+    clock = FakeClock()
+    return clock, Scheduler(clock=clock, autostart=False, **kwargs)
+
+
+def test_manual_mode_starts_no_thread():
+    _, scheduler = make_scheduler()
+    scheduler.every('job', 10, lambda: None)
+    assert scheduler.thread is None
+
+
+def test_jobs_run_when_due():
+    clock, scheduler = make_scheduler()
+    runs = []
+    scheduler.every('job', 10, lambda: runs.append(clock()))
+    assert scheduler.run_pending() == 0
+    clock.advance(10)
+    assert scheduler.run_pending() == 1
+    clock.advance(5)
+    assert scheduler.run_pending() == 0
+    clock.advance(5)
+    assert scheduler.run_pending() == 1
+    assert runs == [1010.0, 1020.0]
+
+
+def test_delay_and_return_values():
+    clock, scheduler = make_scheduler()
+    results = iter([3, False])
+    scheduler.every('job', 10, lambda: next(results), delay=0)
+    assert scheduler.run_pending() == 1  # returns 3: next run in 3s, not 10s
+    clock.advance(3)
+    assert scheduler.run_pending() == 1  # returns False: job ends
+    assert not scheduler.scheduled('job')
+    clock.advance(100)
+    assert scheduler.run_pending() == 0
+
+
+def test_failing_job_keeps_its_schedule():
+    clock, scheduler = make_scheduler()
+    
+    def boom():
+        raise ValueError("boom")
+        
+    scheduler.every('job', 5, boom)
+    clock.advance(5)
+    assert scheduler.run_pending() == 1
+    assert scheduler.jobs['job']['error'] == "boom"
+    clock.advance(5)
+    assert scheduler.run_pending() == 1
+
+
+def test_cancel_and_replace():
+    clock, scheduler = make_scheduler()
+    runs = []
+    scheduler.every('job', 10, lambda: runs.append('old'))
+    scheduler.every('job', 20, lambda: runs.append('new'))  # replaces, old heap entry goes stale
+    clock.advance(10)
+    assert scheduler.run_pending() == 0
+    clock.advance(10)
+    assert scheduler.run_pending() == 1
+    assert scheduler.cancel('job')
+    assert not scheduler.cancel('job')
+    clock.advance(20)
+    assert scheduler.run_pending() == 0
+    assert runs == ['new']
+
+
+def test_probe_coalescing_within_window():
+    clock, scheduler = make_scheduler(probe_window=5)
+    calls = []
+    
+    def probe():
+        calls.append(clock())
+        return {'working': True}
+        
+    assert scheduler.probe('1.2.3.4:80', probe) == {'working': True}
+    clock.advance(4)
+    scheduler.probe('1.2.3.4:80', probe)
+    assert len(calls) == 1
+    scheduler.probe('5.6.7.8:80', probe)
+    assert len(calls) == 2
+    clock.advance(2)
+    scheduler.probe('1.2.3.4:80', probe)
+    assert len(calls) == 3
+
+
+def test_concurrent_probes_share_one_call():
+    _, scheduler = make_scheduler()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    
+    def probe():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'result'
+        
+    results = []
+    first = threading.Thread(target=lambda: results.append(scheduler.probe('key', probe)))
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=lambda: results.append(scheduler.probe('key', probe)))
+    second.start()
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert calls == [1]
+    assert results == ['result', 'result']
+
+
+def test_stop_with_timer_thread():
+    scheduler = Scheduler()
+    ran = threading.Event()
+    scheduler.every('job', 0.01, ran.set)
+    assert ran.wait(5)
+    scheduler.stop()
+    assert scheduler.thread is None and not scheduler.jobs
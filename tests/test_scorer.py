@@ -0,0 +1,53 @@
+from ip_alchemist import ProxyScorer
+
+
+def proxy(host, latency):
+    return {'host': host, 'port': 8080, 'protocol': 'http', 'latency': latency}
+
+
+def hosts(proxies):
+    return [p['host'] for p in proxies]
+
+
+def test_best_orders_by_latency_and_reliability():
+    scorer = ProxyScorer()
+    fast, slow = proxy('10.0.0.1', 100), proxy('10.0.0.2', 400)
+    scorer.sync([fast, slow])
+    assert hosts(scorer.best(2)) == ['10.0.0.1', '10.0.0.2']
+    scorer.record(fast, False)  # a fresh failure inflates the score
+    assert hosts(scorer.best(2)) == ['10.0.0.2', '10.0.0.1']
+
+
+def test_best_respects_exclude_and_keeps_heap():
+    scorer = ProxyScorer()
+    scorer.sync([proxy('10.0.0.1', 100), proxy('10.0.0.2', 200)])
+    assert hosts(scorer.best(1, exclude={'10.0.0.1:8080'})) == ['10.0.0.2']
+    assert hosts(scorer.best(2)) == ['10.0.0.1', '10.0.0.2']
+
+
+def test_readded_key_does_not_revive_stale_score():
+    scorer = ProxyScorer()
+    first, other = proxy('10.0.0.1', 10), proxy('10.0.0.2', 500)
+    scorer.sync([first, other])
+    scorer.sync([other])  # drops 10.0.0.1; its heap item stays behind
+    assert hosts(scorer.best(2)) == ['10.0.0.2']
+    scorer.sync([other, proxy('10.0.0.1', 900)])
+    assert hosts(scorer.best(2)) == ['10.0.0.2', '10.0.0.1']
+
+
+def test_discarded_proxy_is_not_returned():
+    scorer = ProxyScorer()
+    banned = proxy('10.0.0.1', 100)
+    scorer.sync([banned, proxy('10.0.0.2', 200)])
+    scorer.discard(banned)
+    assert hosts(scorer.best(2)) == ['10.0.0.2']
+
+
+def test_failure_penalty_decays_without_new_probes():
+    scorer = ProxyScorer(failure_window=300)
+    fast, slow = proxy('10.0.0.1', 100), proxy('10.0.0.2', 400)
+    scorer.sync([fast, slow])
+    scorer.record(fast, False)
+    assert hosts(scorer.best(2)) == ['10.0.0.2', '10.0.0.1']
+    scorer.stats['10.0.0.1:8080']['last_failure'] -= 300  # the failure window has passed
+    assert hosts(scorer.best(2)) == ['10.0.0.1', '10.0.0.2']
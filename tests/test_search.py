@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+import ip_alchemist
+from benchmark import EXIT_NETWORK, FARM_HOST, LocalEndpoints, ProxyFarm
+from ip_alchemist import ProxyScorer
+
+
+def proxy(host, latency):
+    return {'host': host, 'port': 8080, 'protocol': 'http', 'latency': latency}
+
+
+def test_timeout_uses_p95_with_margin_and_clamps():
+    scorer = ProxyScorer(min_samples=3)
+    p = proxy('10.0.0.1', 100)
+    assert scorer.timeout(p, default=5) == 5
+    for latency in (200, 300, 400):
+        scorer.record(p, True, latency)
+    assert scorer.timeout(p, default=5, floor=0.1, ceiling=8, margin=1.5) == pytest.approx(0.6)
+    assert scorer.timeout(p, default=5, floor=1.0) == 1.0
+    assert scorer.timeout(p, default=5, floor=0.1, ceiling=0.5) == 0.5
+    assert scorer.expected_latency(p) == 300
+
+
+@pytest.fixture
+def farm():
+    farm = ProxyFarm(2, socks_share=0, latency=20, jitter=0)
+    farm.start()
+    endpoints = LocalEndpoints(farm)
+    endpoints.start()
+    yield farm, endpoints
+    endpoints.stop()
+    farm.stop()
+
+
+@pytest.fixture
+def app(farm, tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ip_alchemist, 'IP_CHECK_URL', f"{farm[1].base_url}/ip")
+    app = ip_alchemist.IPAlchemist()
+    app.config.update({'search_workers': 1, 'hedge_min_delay': 0.1, 'search_deadline': 5})
+    return app
+
+
+def farm_proxies(farm):
+    return [{'host': FARM_HOST, 'port': p.port, 'protocol': 'http', 'latency': p.latency} for p in farm[0].proxies]
+
+
+def test_hedged_search_routes_around_a_slow_proxy(farm, app):
+    slow, fast = farm_proxies(farm)
+    farm[0].proxies[0].latency = 2000
+    start = time.time()
+    found = app.parallel_find_working_proxy([slow, fast])
+    assert found['port'] == fast['port'] and found['ip'] == str(EXIT_NETWORK + 1)
+    assert time.time() - start < 1.5
+
+
+def test_unhedged_search_waits_for_the_first_candidate(farm, app):
+    slow, fast = farm_proxies(farm)
+    farm[0].proxies[0].latency = 500
+    app.config['hedged_probes'] = False
+    assert app.parallel_find_working_proxy([slow, fast])['port'] == slow['port']
+
+
+def test_search_gives_up_when_every_probe_fails(farm, app):
+    for proxy in farm[0].proxies:
+        proxy.failure_rate = 1.0
+    assert app.parallel_find_working_proxy(farm_proxies(farm)) is None